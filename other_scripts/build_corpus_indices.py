@@ -0,0 +1,7 @@
+from tatoebator.external_download_requester import ExternalDownloadRequester
+from tatoebator.sentences import SentenceProducer
+
+# builds the lemma -> offset index of every searchable corpus that has been downloaded
+# this runs mecab over every sentence, so it takes a long time - but it only has to be done once per download
+sentence_producer = SentenceProducer(ExternalDownloadRequester(), None)
+sentence_producer.build_corpus_indices(progress_callback=print)
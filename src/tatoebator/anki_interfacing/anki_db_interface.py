@@ -1,10 +1,11 @@
 from enum import Enum
-from typing import Dict, Tuple, Set, List
+from typing import Dict, Tuple, Set, List, Optional
 
 from anki.notes import NoteId
 from aqt import mw
 
 from .card_creator import CardCreator
+from .known_word_tracker import KnownWordTracker
 from .notetype_registrar import NotetypeRegistrar
 from .vocab_field_registry import FieldPointer, VocabFieldRegistry
 from ..audio import MediaManager
@@ -21,6 +22,8 @@ class AnkiDbInterface:
     def __init__(self, media_manager: MediaManager):
         self.col = mw.col
         self.other_vocab_fields = VocabFieldRegistry.load_or_create()
+        self._known_word_tracker = KnownWordTracker.load_or_create()
+        self._synced_known_word_tracker: Optional[KnownWordTracker] = None
 
         notetype_registrar = NotetypeRegistrar.load_or_create()
         notetype_registrar.ensure_notetype_exists(self.col)
@@ -111,19 +114,12 @@ class AnkiDbInterface:
                 WordInLibraryType.IN_LIBRARY_NEW: pending_words, }
 
     def _get_known_words_in_deck(self, field_pointer: FieldPointer):
-        col = self.col
-
-        col.db.all(f"CREATE TEMPORARY TABLE results AS\
-                    SELECT field_at_index(n.flds, {field_pointer.field_ord}) AS string, c.ivl AS ivl\
-                    FROM notes n\
-                    JOIN cards c ON n.id = c.nid\
-                    WHERE n.mid = {field_pointer.notetype_id} AND c.did = {field_pointer.deck_id}")
-
-        data_known = col.db.all("SELECT string FROM results WHERE ivl > 0")
-        col.db.all("DROP TABLE results")
-
-        known_words = set([row[0] for row in data_known])
-        return known_words
+        data_known = self.col.db.all(f"SELECT DISTINCT field_at_index(n.flds, {field_pointer.field_ord})\
+                                       FROM notes n\
+                                       JOIN cards c ON n.id = c.nid\
+                                       WHERE n.mid = {field_pointer.notetype_id} AND c.did = {field_pointer.deck_id}\
+                                       AND c.ivl > 0")
+        return {row[0] for row in data_known}
 
     def group_text_by_library(self, words):
         classified = {kind: set() for kind in WordInLibraryType}
@@ -141,3 +137,24 @@ class AnkiDbInterface:
         for field_pointer in self.other_vocab_fields:
             known_words.update(self._get_known_words_in_deck(field_pointer))
         return known_words
+
+    def get_known_word_changes(self, db_generation: str) -> Optional[Tuple[Set[str], Set[str]]]:
+        """
+        (newly known, newly unknown) words since the last sync, only looking at cards modified since then
+        None if there's no previous sync to compare against, or it was made against a different sentence db (see
+        SentenceDbInterface.generation) - then it's up to the caller to do a full sync w get_known_words
+        either way, call save_known_word_tracking once the changes have been applied. until then the sync is only
+        done on a copy, so if applying them fails the next call returns them again
+        """
+        had_baseline = self._known_word_tracker.has_baseline and self._known_word_tracker.db_generation == db_generation
+        tracker = self._known_word_tracker.copy()
+        changes = tracker.sync(self.col, list(self.other_vocab_fields))
+        tracker.db_generation = db_generation
+        self._synced_known_word_tracker = tracker
+        return changes if had_baseline else None
+
+    def save_known_word_tracking(self):
+        if self._synced_known_word_tracker is None: return
+        self._known_word_tracker = self._synced_known_word_tracker
+        self._synced_known_word_tracker = None
+        self._known_word_tracker.save()
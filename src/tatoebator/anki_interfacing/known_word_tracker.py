@@ -0,0 +1,141 @@
+import os
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Dict, List, Set, Tuple, Optional
+
+from .vocab_field_registry import FieldPointer
+from ..constants import PATH_TO_USER_FILES
+from ..persistence import PossiblyEmptyPersistable
+
+
+@dataclass
+class TrackedFieldState:
+    # the field pointer is flattened in here, the persistence module doesn't do nested dataclasses
+    deck_id: int
+    notetype_id: int
+    field_ord: int
+    last_mod: int  # latest card/note mod seen in this field
+    known_cards: Dict[str, str]  # card id (str, for json) -> contents of the field, only for cards with ivl > 0
+
+    @property
+    def field_pointer(self) -> FieldPointer:
+        return FieldPointer(self.deck_id, self.notetype_id, self.field_ord)
+
+
+class KnownWordTracker(PossiblyEmptyPersistable):
+    """
+    remembers which cards of each registered field were known (ivl > 0) as of the last sync, along with the latest
+    modification time seen, so syncing w the collection only has to look at cards/notes modified since then
+    and can return just the words whose known state changed
+
+    deleted cards (and cards moved out of the deck) don't show up as modifications - these are caught by comparing
+    the amt of known cards in the field w what we have, in which case the field is rescanned entirely
+
+    the changes are only meaningful for the sentence db they were last applied to, so the tracker records its
+    generation (see SentenceDbInterface.generation)
+    """
+    default_filepath = os.path.join(PATH_TO_USER_FILES, "known_word_tracker.ejson")
+
+    def __init__(self, field_states: List[TrackedFieldState], db_generation: Optional[str]):
+        self.field_states = field_states
+        self.db_generation = db_generation
+        # no previous sync to diff against if this is empty()
+        self.has_baseline = True
+        # amt of known cards for each word, across all fields - a word is known if this is > 0
+        self._known_card_counts = Counter(word for state in field_states for word in state.known_cards.values())
+
+    @classmethod
+    def empty(cls):
+        tracker = cls([], None)
+        tracker.has_baseline = False
+        return tracker
+
+    @classmethod
+    def load_or_create(cls):
+        # loading looks up the dataclasses it finds by name in the globals of the calling frames, i.e. this module
+        try:
+            return super().load_or_create()
+        except Exception:
+            # unreadable or from an older version - this is just a cache, start over w a full sync
+            return cls.empty()
+
+    def copy(self) -> "KnownWordTracker":
+        # (the known_cards dicts are the only thing sync modifies in place)
+        tracker = KnownWordTracker([replace(state, known_cards=dict(state.known_cards)) for state in self.field_states],
+                                   self.db_generation)
+        tracker.has_baseline = self.has_baseline
+        return tracker
+
+    def save(self, filepath=None):
+        super().save(filepath)
+        self.has_baseline = True
+
+    @property
+    def known_words(self) -> Set[str]:
+        return {word for word, count in self._known_card_counts.items() if count > 0}
+
+    def sync(self, col, field_pointers: List[FieldPointer]) -> Tuple[Set[str], Set[str]]:
+        """
+        brings the tracked state up to date w the collection
+        returns (newly known, newly unknown) words. doesn't save - do that once the changes have been applied
+        """
+        was_known: Dict[str, bool] = {}
+
+        def set_card(state: TrackedFieldState, card_id: str, word: str, known: bool):
+            previous_word = state.known_cards.pop(card_id, None)
+            if previous_word is not None:
+                was_known.setdefault(previous_word, self._known_card_counts[previous_word] > 0)
+                self._known_card_counts[previous_word] -= 1
+            if known:
+                was_known.setdefault(word, self._known_card_counts[word] > 0)
+                state.known_cards[card_id] = word
+                self._known_card_counts[word] += 1
+
+        def forget_cards(state: TrackedFieldState):
+            for card_id in list(state.known_cards):
+                set_card(state, card_id, state.known_cards[card_id], False)
+
+        # forget fields that were unregistered
+        field_pointers = set(field_pointers)
+        for state in [state for state in self.field_states if state.field_pointer not in field_pointers]:
+            forget_cards(state)
+            self.field_states.remove(state)
+
+        tracked_pointers = {state.field_pointer for state in self.field_states}
+        self.field_states.extend(TrackedFieldState(field_pointer.deck_id, field_pointer.notetype_id,
+                                                   field_pointer.field_ord, 0, {})
+                                 for field_pointer in field_pointers - tracked_pointers)
+
+        for state in self.field_states:
+            for card_id, word, ivl, mod in self._get_modified_cards(col, state.field_pointer, state.last_mod):
+                set_card(state, str(card_id), word, ivl > 0)
+                state.last_mod = max(state.last_mod, mod)
+            if self._count_known_cards(col, state.field_pointer) != len(state.known_cards):
+                # something left the field w/o being modified - start over
+                forget_cards(state)
+                for card_id, word, ivl, mod in self._get_modified_cards(col, state.field_pointer, 0):
+                    set_card(state, str(card_id), word, ivl > 0)
+                    state.last_mod = max(state.last_mod, mod)
+
+        newly_known = {word for word, known in was_known.items() if not known and self._known_card_counts[word] > 0}
+        newly_unknown = {word for word, known in was_known.items() if known and self._known_card_counts[word] <= 0}
+        for word in newly_unknown:
+            del self._known_card_counts[word]
+        return newly_known, newly_unknown
+
+    @staticmethod
+    def _get_modified_cards(col, field_pointer: FieldPointer, since: int) -> List[Tuple[int, str, int, int]]:
+        # (>= since, not >, because mod only has second resolution - seeing a card twice is harmless)
+        return col.db.all(f"SELECT c.id, field_at_index(n.flds, {field_pointer.field_ord}), c.ivl, MAX(c.mod, n.mod)\
+                            FROM cards c\
+                            JOIN notes n ON n.id = c.nid\
+                            WHERE n.mid = {field_pointer.notetype_id} AND c.did = {field_pointer.deck_id}\
+                            AND (c.mod >= {since} OR n.mod >= {since})")
+
+    @staticmethod
+    def _count_known_cards(col, field_pointer: FieldPointer) -> int:
+        return col.db.scalar(f"SELECT COUNT(*)\
+                               FROM cards c\
+                               JOIN notes n ON n.id = c.nid\
+                               WHERE n.mid = {field_pointer.notetype_id} AND c.did = {field_pointer.deck_id}\
+                               AND c.ivl > 0")
@@ -5,6 +5,7 @@ SUDACHI_EXE = os.path.join(Path.home(), "AppData", "Local", "Programs", "Python"
                            "sudachipy.exe")
 MECAB_DIR = os.path.join("C:", os.sep, "Program Files", "MeCab")
 MECAB_EXE = os.path.join(MECAB_DIR, "bin", "mecab.exe")
+MECAB_PROCESSES = max(1, min(4, (os.cpu_count() or 1) // 2))  # size of the pool of mecab processes
 
 VOICEVOX_EXE_PATH = os.path.join(
     "C:",
@@ -20,5 +20,7 @@ PATH_TO_USER_FILES = os.path.join(PATH_TO_ADDON, "user_files")
 PATH_TO_LOGS = os.path.join(PATH_TO_ADDON, "logs")
 PATH_TO_SOURCES_FILE = os.path.join(PATH_TO_USER_FILES, "annotated_data_sources.txt")
 PATH_TO_DATABASE = os.path.join(PATH_TO_USER_FILES, "sentences.db")
+PATH_TO_LEXICAL_CONTENT_CACHE = os.path.join(PATH_TO_USER_FILES, "lexical_content_cache.sqlite")
+PATH_TO_TRANSLATION_CACHE = os.path.join(PATH_TO_USER_FILES, "translation_cache.sqlite")
 PATH_TO_EXTERNAL_DOWNLOADS = os.path.join(PATH_TO_USER_FILES, "external_downloads")
 PATH_TO_TEMP_EXTERNAL_DOWNLOADS = os.path.join(PATH_TO_USER_FILES, "temp_external_downloads")
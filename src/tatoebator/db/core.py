@@ -1,12 +1,18 @@
 import atexit
-from typing import List, Set, Dict, Optional
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import List, Set, Dict, Optional, Tuple, Sequence, FrozenSet
 
 from sqlalchemy import create_engine, Column, Integer, SmallInteger, String, Text, ForeignKey, Index, func, Boolean, \
-    case
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker, joinedload
+    Float, case, insert, select, update, event, text
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, joinedload, selectinload
 
 from ..constants import PATH_TO_DATABASE
 from ..sentences import ExampleSentence
+from ..util import batched
 
 Base = declarative_base()
 
@@ -34,6 +40,9 @@ class SentenceKeyword(Base):
     id = Column(Integer, primary_key=True)
     sentence_id = Column(Integer, ForeignKey('sentences.id'), nullable=False, index=True)
     keyword_id = Column(Integer, ForeignKey('keywords.id'), nullable=False, index=True)
+    # copy of the ranking score of the sentence (see SentenceDbInterface._score), so that the best sentences for a
+    # keyword can be read straight off an index
+    score = Column(Float, nullable=True)
 
     sentence = relationship("Sentence", back_populates="keywords")
     keyword = relationship("Keyword")
@@ -42,6 +51,7 @@ class SentenceKeyword(Base):
         Index('idx_sentence_keyword_sentence_id', 'sentence_id'),
         Index('idx_sentence_keyword_keyword_id', 'keyword_id'),
         Index('idx_sentence_keyword_sentence_keyword', 'sentence_id', 'keyword_id'),  # For faster joins
+        Index('idx_sentence_keyword_keyword_score', 'keyword_id', 'score', 'sentence_id'),  # covering, for top-k
     )
 
 
@@ -57,16 +67,110 @@ class Keyword(Base):
     )
 
 
+class DbInfo(Base):
+    """Facts about the db itself."""
+    __tablename__ = 'db_info'
+    key = Column(Text, primary_key=True)
+    value = Column(Text, nullable=False)
+
+
+@dataclass
+class SqliteConnectionProfile:
+    """
+    pragmas applied to every connection to the sentence db
+    WAL lets the gui read (e.g. sentence counts) while ingestion is writing, and synchronous=NORMAL is safe under WAL
+    """
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 2 ** 20  # bytes
+    cache_size: int = -64000  # negative means KiB
+    temp_store: str = "MEMORY"
+    read_pool_size: int = 4
+
+    def apply(self, dbapi_connection, read_only: bool = False):
+        cursor = dbapi_connection.cursor()
+        # journal mode is persistent and set by the writer
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={self.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        cursor.execute(f"PRAGMA cache_size={self.cache_size}")
+        cursor.execute(f"PRAGMA temp_store={self.temp_store}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
 class SentenceDbInterface:
-    def __init__(self):
+    # sqlite limits the amount of bound parameters in a query (999 in older versions)
+    _max_query_parameters = 900
+
+    def __init__(self, connection_profile: Optional[SqliteConnectionProfile] = None):
+        self._connection_profile = connection_profile or SqliteConnectionProfile()
         self._database_url = f'sqlite:///{PATH_TO_DATABASE}'
         self._engine = create_engine(self._database_url)
+        event.listen(self._engine, "connect",
+                     lambda dbapi_connection, _: self._connection_profile.apply(dbapi_connection))
+        self._add_score_column_if_missing()
         Base.metadata.create_all(self._engine)
         atexit.register(self._engine.dispose)
+        # random id given to the db when it's created. state kept outside the db that has to match its contents
+        # (like the known word tracking) records this, so it can tell when the db has been replaced
+        self.generation = self._get_or_create_generation()
+
+        # separate pool of query-only connections for reads that might come from other threads (e.g. the gui)
+        self._read_engine = create_engine(self._database_url, pool_size=self._connection_profile.read_pool_size)
+        event.listen(self._read_engine, "connect",
+                     lambda dbapi_connection, _: self._connection_profile.apply(dbapi_connection, read_only=True))
+        atexit.register(self._read_engine.dispose)
 
         self._session_constructor = sessionmaker(bind=self._engine)
+        self._read_session_constructor = sessionmaker(bind=self._read_engine)
         self._session = None  # no real need to worry about this but cleaner this way
 
+        # 64-bit hashes of every sentence in the db, loaded on first use and kept up to date by the inserts
+        # so that searches can check candidates against the db without a query each
+        self._sentence_hashes: Optional[Set[int]] = None
+        self._sentence_hashes_lock = threading.Lock()
+
+    def _add_score_column_if_missing(self):
+        # dbs created before sentence_keywords had a score column. create_all won't add columns to existing tables
+        with self._engine.begin() as connection:
+            columns = [row[1] for row in connection.execute(text("PRAGMA table_info(sentence_keywords)"))]
+            if columns and "score" not in columns:
+                connection.execute(text("ALTER TABLE sentence_keywords ADD COLUMN score FLOAT"))
+                connection.execute(text(f"UPDATE sentence_keywords SET score = "
+                                        f"(SELECT {self._score_sql} FROM sentences s "
+                                        f"WHERE s.id = sentence_keywords.sentence_id)"))
+                # nor indices
+                connection.execute(text("CREATE INDEX idx_sentence_keyword_keyword_score "
+                                        "ON sentence_keywords (keyword_id, score, sentence_id)"))
+
+    def _get_or_create_generation(self) -> str:
+        with self._engine.begin() as connection:
+            generation = connection.execute(select(DbInfo.value).where(DbInfo.key == 'generation')).scalar()
+            if generation is None:
+                generation = uuid.uuid4().hex
+                connection.execute(insert(DbInfo).values(key='generation', value=generation))
+        return generation
+
+    # order in which sentences are served: by (in)comprehensibility, with a bonus for trusted (=passed extra checks)
+    # sentences which is more significant for shorter sentences. lower is better
+    _score_sql = "(s.n_unknown_words - 2 * s.trusted) * 1.0 / s.n_keywords"
+
+    @staticmethod
+    def _score(n_unknown_words: int, trusted: bool, n_keywords: int) -> Optional[float]:
+        # same as _score_sql (which is null for 0 keywords, as sqlite gives null when dividing by 0)
+        if not n_keywords: return None
+        return (n_unknown_words - 2 * trusted) / n_keywords
+
+    def _update_scores(self, only_sentences_in: Optional[str] = None):
+        # only_sentences_in: sql for a subquery selecting the ids of the sentences whose scores changed
+        where = f"WHERE sentence_id IN ({only_sentences_in})" if only_sentences_in is not None else ""
+        self._session.execute(text(f"UPDATE sentence_keywords SET score = "
+                                   f"(SELECT {self._score_sql} FROM sentences s "
+                                   f"WHERE s.id = sentence_keywords.sentence_id) {where}"))
+
     def _open_session(self):
         self._session = self._session_constructor()
 
@@ -74,82 +178,108 @@ class SentenceDbInterface:
         # careful, doesn't commit!!
         self._session.close()
 
+    @contextmanager
+    def _read_session(self):
+        # short-lived session on the read pool - unlike self._session, fine to use from any thread
+        session = self._read_session_constructor()
+        try:
+            yield session
+        finally:
+            session.close()
+
     def check_sentence(self, sentence: str, commit=True):
         if self._session is None: self._open_session()
         existing = self._session.query(Sentence).filter_by(japanese=sentence).first()
         if commit: self._session.commit()
         return existing or None  # None if existing is falsey
 
-    def count_n_sentences(self):
-        if self._session is None: self._open_session()
-
-        return self._session.query(func.count(Sentence.id)).scalar()
+    @staticmethod
+    def _sentence_hash(sentence: str) -> int:
+        return int.from_bytes(blake2b(sentence.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _get_sentence_hashes(self) -> Set[int]:
+        with self._sentence_hashes_lock:
+            if self._sentence_hashes is None:
+                with self._read_session() as session:
+                    self._sentence_hashes = {self._sentence_hash(japanese) for japanese in
+                                             session.execute(select(Sentence.japanese)
+                                                             .execution_options(yield_per=10000)).scalars()}
+            return self._sentence_hashes
+
+    def contains_sentence(self, sentence: str) -> bool:
+        # false positives only on a 64-bit hash collision - fine for filtering search candidates
+        # use check_sentence if you need the row
+        return self._sentence_hash(sentence) in self._get_sentence_hashes()
 
-    def _insert_keywords(self, keywords: Set[str]) -> Dict[str, int]:
-        keywords_in_database = {k.keyword: k for k in
-                                self._session.query(Keyword).filter(Keyword.keyword.in_(keywords)).all()}
-        keywords_to_insert = {k: Keyword(keyword=k, known=False) for k in keywords if k not in keywords_in_database}
-        self._session.add_all(keywords_to_insert.values())
-        self._session.flush()
-        keywords_in_database.update(keywords_to_insert)
-        return {k: keyword.id for k, keyword in keywords_in_database.items()}
+    def count_n_sentences(self):
+        with self._read_session() as session:
+            return session.query(func.count(Sentence.id)).scalar()
+
+    def _insert_keywords(self, keywords: Set[str]) -> Dict[str, Tuple[int, bool]]:
+        # keywords that are already in the db are left as they are (in particular their known field)
+        # returns keyword -> (id, known)
+        keywords = list(keywords)
+        if keywords:
+            self._session.execute(insert(Keyword.__table__).prefix_with("OR IGNORE"),
+                                  [{"keyword": keyword, "known": False} for keyword in keywords])
+        keyword_to_id_known = {}
+        for keyword_batch in batched(keywords, self._max_query_parameters):
+            keyword_to_id_known.update((row.keyword, (row.id, row.known)) for row in
+                                       self._session.execute(select(Keyword.keyword, Keyword.id, Keyword.known)
+                                                             .where(Keyword.keyword.in_(keyword_batch))))
+        return keyword_to_id_known
 
     def insert_sentence(self, sentence, verify_not_repeated=True):
-        if self._session is None: self._open_session()
-
-        if verify_not_repeated:
-            existing = self.check_sentence(sentence.sentence, commit=False)
-            if existing is not None:
-                raise Exception(f"Sentence already exists with ID {existing.id}.")
-
-        # insert sentence
-        new_sentence = self._row_from_example_sentence(sentence)
-        self._session.add(new_sentence)
-        self._session.flush()  # Flush to get the new sentence ID
-
-        # insert keywords that aren't already present, get keyword -> db id map
-        keyword_to_id = self._insert_keywords(set(sentence.lexical_words))
-
-        # use sentence id and keyword id map to insert SentenceKeyword Pairs
-        self._session.add_all([SentenceKeyword(sentence_id=new_sentence.id, keyword_id=keyword_to_id[lw])
-                               for lw in sentence.lexical_words])
-        self._session.flush()
-
-        self._session.commit()
+        self.insert_sentences_batched([sentence], verify_not_repeated=verify_not_repeated)
 
     def insert_sentences_batched(self, sentences, verify_not_repeated=True):
         if self._session is None: self._open_session()
+        sentences = list(sentences)
+        if not sentences: return
 
-        keyword_by_sentence = []
-        keywords_to_insert = set()
-        for sentence in sentences:
-
-            if verify_not_repeated:
-                existing = self.check_sentence(sentence.sentence, commit=False)
+        if verify_not_repeated:
+            for sentence_batch in batched(sentences, self._max_query_parameters):
+                existing = self._session.execute(select(Sentence.id)
+                                                 .where(Sentence.japanese.in_([s.sentence for s in sentence_batch]))
+                                                 ).first()
                 if existing is not None:
                     raise Exception(f"Sentence already exists with ID {existing.id}.")
 
-            new_sentence = self._row_from_example_sentence(sentence)
-            self._session.add(new_sentence)
-            self._session.flush()  # Flush to get ID for keywords
-
-            keywords_to_insert.update(sentence.lexical_words)
-            keyword_by_sentence.append((new_sentence.id, sentence.lexical_words))
-
-        keyword_to_id = self._insert_keywords(keywords_to_insert)
-        relations_to_insert = []
-        for sentence_id, keywords in keyword_by_sentence:
-            relations_to_insert.extend([SentenceKeyword(sentence_id=sentence_id,
-                                                        keyword_id=keyword_to_id[keyword])
-                                        for keyword in keywords])
-        self._session.add_all(relations_to_insert)
-        self._session.flush()
-        self._session.commit()
+        # core inserts w executemany (on the tables, not the orm classes - orm bulk inserts have a lot of overhead)
+        # instead of orm objects flushed one at a time. all in a single transaction
+        try:
+            # keywords first, so the sentences go in with their known/unknown counts already right
+            keyword_to_id_known = self._insert_keywords({keyword for sentence in sentences
+                                                         for keyword in sentence.lexical_words})
+            sentence_rows = []
+            for sentence in sentences:
+                row = self._row_values_from_example_sentence(sentence)
+                row["n_known_words"] = sum(keyword_to_id_known[keyword][1] for keyword in sentence.lexical_words)
+                row["n_unknown_words"] = row["n_keywords"] - row["n_known_words"]
+                sentence_rows.append(row)
+            rows = self._session.execute(insert(Sentence.__table__).returning(Sentence.id, Sentence.japanese),
+                                         sentence_rows)
+            # (japanese is unique)
+            sentence_to_id = {japanese: sentence_id for sentence_id, japanese in rows}
+
+            relations_to_insert = [{"sentence_id": sentence_to_id[row["japanese"]],
+                                    "keyword_id": keyword_to_id_known[keyword][0],
+                                    "score": self._score(row["n_unknown_words"], row["trusted"], row["n_keywords"])}
+                                   for sentence, row in zip(sentences, sentence_rows)
+                                   for keyword in sentence.lexical_words]
+            if relations_to_insert:
+                self._session.execute(insert(SentenceKeyword.__table__), relations_to_insert)
+            self._session.commit()
+            with self._sentence_hashes_lock:
+                if self._sentence_hashes is not None:
+                    self._sentence_hashes.update(self._sentence_hash(sentence.sentence) for sentence in sentences)
+        except Exception:
+            self._session.rollback()
+            raise
 
     @classmethod
-    def _row_from_example_sentence(cls, sentence: ExampleSentence):
-        # careful, you can't just insert this as-is! use the insert function to also register lexical word relations
-        return Sentence(
+    def _row_values_from_example_sentence(cls, sentence: ExampleSentence):
+        return dict(
             english=sentence.translation,
             japanese=sentence.sentence,
             source_tag=sentence.source_tag,
@@ -160,6 +290,11 @@ class SentenceDbInterface:
             n_unknown_words=sentence.n_unknown_words,
         )
 
+    @classmethod
+    def _row_from_example_sentence(cls, sentence: ExampleSentence):
+        # careful, you can't just insert this as-is! use the insert function to also register lexical word relations
+        return Sentence(**cls._row_values_from_example_sentence(sentence))
+
     @staticmethod
     def _row_to_example_sentence(row):
         # this should come pre-joined with the required rows in Keyword
@@ -186,94 +321,101 @@ class SentenceDbInterface:
         :return: list of found sentences, as ExampleSentences
         """
         # todo update so it uses the proper order
-        if self._session is None: self._open_session()
-
-        results = (
-            self._session.query(Sentence)
-                .join(SentenceKeyword, Sentence.id == SentenceKeyword.sentence_id)
-                .join(Keyword, SentenceKeyword.keyword_id == Keyword.id)
-                .filter(Keyword.keyword == word)
-                .limit(desired_amt)
-                .options(joinedload(Sentence.keywords).joinedload(SentenceKeyword.keyword))  # retain keywords
-                .all()
-        )
+        with self._read_session() as session:
+            results = (
+                session.query(Sentence)
+                    .join(SentenceKeyword, Sentence.id == SentenceKeyword.sentence_id)
+                    .join(Keyword, SentenceKeyword.keyword_id == Keyword.id)
+                    .filter(Keyword.keyword == word)
+                    .limit(desired_amt)
+                    .options(joinedload(Sentence.keywords).joinedload(SentenceKeyword.keyword))  # retain keywords
+                    .all()
+            )
 
-        return list(map(SentenceDbInterface._row_to_example_sentence, results))
+            return list(map(SentenceDbInterface._row_to_example_sentence, results))
 
     def get_sentences_by_word_batched(self, word_desired_amts: Dict[str, int]):
 
-        if self._session is None: self._open_session()
-
-        words = list(word_desired_amts.keys())
-        max_limit = max(word_desired_amts.values())
-
-        ids_by_word_query = (
-            self._session.query(Keyword.keyword,
-                                SentenceKeyword.sentence_id,
-                                func.row_number()
-                                # order by comprehensibility, with a bonus for trusted (=passed extra checks) sentences
-                                # which is more significant for shorter sentences
-                                .over(partition_by=Keyword.keyword,
-                                      order_by=(Sentence.n_unknown_words-2*Sentence.trusted)/Sentence.n_keywords)
-                                .label("rn")
-                                )
-            .join(SentenceKeyword, SentenceKeyword.keyword_id == Keyword.id)
-            .join(Sentence, SentenceKeyword.sentence_id == Sentence.id)
-            .filter(Keyword.keyword.in_(words))
-            .subquery()
-        )
-
-        results = (
-            self._session.query(ids_by_word_query.c.keyword,
-                                Sentence)
-            .filter(ids_by_word_query.c.rn <= max_limit)
-            .join(Sentence, Sentence.id == ids_by_word_query.c.sentence_id)
-            .all()
-        )
-
-        # not 100% sqlalchemy optimizes away the joins
-        # leaving this here for debug in case we have performance issues down the line
-        # from sqlalchemy import text
-        # explain_query = text("EXPLAIN " + str(results.statement.compile(compile_kwargs={"literal_binds": True})))
-        # print("\n".join(map(str,self._session.execute(explain_query))))
-
-        word_to_sentences = {word: [] for word in words}
-        for word, sentence in results:
-            word_to_sentences[word].append(sentence)
-
-        for word in words:
-            word_to_sentences[word] = word_to_sentences[word][:word_desired_amts[word]]
-            word_to_sentences[word] = list(map(SentenceDbInterface._row_to_example_sentence, word_to_sentences[word]))
+        with self._read_session() as session:
+            words = list(word_desired_amts.keys())
+            keyword_ids = {}
+            for word_batch in batched(words, self._max_query_parameters):
+                keyword_ids.update(session.execute(select(Keyword.keyword, Keyword.id)
+                                                   .where(Keyword.keyword.in_(word_batch))).all())
+
+            # top k for each word straight off idx_sentence_keyword_keyword_score, in order of score
+            sentence_ids_by_word = {word: [] for word in words}
+            for word, keyword_id in keyword_ids.items():
+                sentence_ids = sentence_ids_by_word[word]
+                result = session.execute(select(SentenceKeyword.sentence_id)
+                                         .where(SentenceKeyword.keyword_id == keyword_id)
+                                         .order_by(SentenceKeyword.score, SentenceKeyword.sentence_id))
+                # rows are read as we go, so this stops scanning as soon as there's enough
+                # (a sentence can contain a keyword more than once, hence the check)
+                for sentence_id, in result:
+                    if len(sentence_ids) >= word_desired_amts[word]: break
+                    if sentence_id not in sentence_ids:
+                        sentence_ids.append(sentence_id)
+                result.close()
+
+            # all sentences at once, w their keywords loaded eagerly so turning them into ExampleSentences doesn't
+            # take a query per sentence
+            sentences_by_id = {}
+            all_sentence_ids = list({sentence_id for sentence_ids in sentence_ids_by_word.values()
+                                     for sentence_id in sentence_ids})
+            for sentence_id_batch in batched(all_sentence_ids, self._max_query_parameters):
+                rows = (
+                    session.query(Sentence)
+                        .filter(Sentence.id.in_(sentence_id_batch))
+                        .options(selectinload(Sentence.keywords).joinedload(SentenceKeyword.keyword))
+                        .all()
+                )
+                sentences_by_id.update((row.id, SentenceDbInterface._row_to_example_sentence(row)) for row in rows)
 
-        return word_to_sentences
+            return {word: [sentences_by_id[sentence_id] for sentence_id in sentence_ids_by_word[word]]
+                    for word in words}
 
     def count_keywords(self, keywords):
-        if self._session is None: self._open_session()
-        result = (
-            self._session.query(Keyword.keyword, func.count(Keyword.keyword))
-                .filter(Keyword.keyword.in_(keywords))
-                .join(SentenceKeyword, Keyword.id == SentenceKeyword.keyword_id)
-                .group_by(Keyword.keyword)
-                .all()
-        )
-        counts = {row[0]: row[1] for row in result}
-        return {keyword: counts.get(keyword, 0) for keyword in keywords}
+        with self._read_session() as session:
+            result = (
+                session.query(Keyword.keyword, func.count(Keyword.keyword))
+                    .filter(Keyword.keyword.in_(keywords))
+                    .join(SentenceKeyword, Keyword.id == SentenceKeyword.keyword_id)
+                    .group_by(Keyword.keyword)
+                    .all()
+            )
+            counts = {row[0]: row[1] for row in result}
+            return {keyword: counts.get(keyword, 0) for keyword in keywords}
 
-    def count_keywords_by_sentence_comprehensibility(self, keywords, min_comprehensibility):
-        if self._session is None: self._open_session()
-        result = (
-            self._session.query(Keyword.keyword, func.count(Keyword.keyword))
-                .filter(Keyword.keyword.in_(keywords))
-                .join(SentenceKeyword, Keyword.id == SentenceKeyword.keyword_id)
-                .join(Sentence, SentenceKeyword.sentence_id == Sentence.id)
-                .filter((Sentence.n_known_words/Sentence.n_keywords)>=min_comprehensibility)
-                .group_by(Keyword.keyword)
-                .all()
-        )
-        counts = {row[0]: row[1] for row in result}
-        return {keyword: counts.get(keyword, 0) for keyword in keywords}
+    def count_keywords_by_comprehensibility(self, keywords: List[str], min_comprehensibilities: Sequence[float]) \
+            -> Dict[str, Tuple[int, ...]]:
+        """
+        for each keyword, the amt of sentences containing it w comprehensibility >= each of min_comprehensibilities
+        one pass w conditional counts instead of a grouped query per threshold
+        """
+        comprehensibility = Sentence.n_known_words * 1.0 / Sentence.n_keywords
+        # (distinct because a sentence can contain a keyword more than once)
+        columns = [func.count(func.distinct(SentenceKeyword.sentence_id if min_comprehensibility <= 0
+                                            else case((comprehensibility >= min_comprehensibility,
+                                                       SentenceKeyword.sentence_id))))
+                   for min_comprehensibility in min_comprehensibilities]
+        counts = {}
+        with self._read_session() as session:
+            for keyword_batch in batched(keywords, self._max_query_parameters):
+                result = (
+                    session.query(Keyword.keyword, *columns)
+                        .filter(Keyword.keyword.in_(keyword_batch))
+                        .join(SentenceKeyword, Keyword.id == SentenceKeyword.keyword_id)
+                        .join(Sentence, SentenceKeyword.sentence_id == Sentence.id)
+                        .group_by(Keyword.keyword)
+                        .all()
+                )
+                counts.update((row[0], tuple(row[1:])) for row in result)
+        no_sentences = tuple(0 for _ in min_comprehensibilities)
+        return {keyword: counts.get(keyword, no_sentences) for keyword in keywords}
 
     def update_known_unknown_counts(self):
+        # full recount - only needed when counts are missing, otherwise apply_known_changes keeps them up to date
         self._update_known_counts()
         self._update_unknown_counts()
 
@@ -292,12 +434,14 @@ class SentenceDbInterface:
                 .subquery()
         )
 
+        # sentences w/o known keywords have no row in the subquery, these get 0 rather than null
         self._session.query(Sentence).update(
             {
-                Sentence.n_known_words: (
+                Sentence.n_known_words: func.coalesce(
                     self._session.query(knowns_by_id.c.count)
                         .filter(Sentence.id == knowns_by_id.c.sentence_id)
-                        .as_scalar()
+                        .scalar_subquery(),
+                    0
                 )
             },
             synchronize_session=False
@@ -313,38 +457,107 @@ class SentenceDbInterface:
             {Sentence.n_unknown_words: Sentence.n_keywords - Sentence.n_known_words},
             synchronize_session=False
         )
+        self._update_scores()
 
         self._session.commit()
 
-    def update_known_field(self, known_words):
+    def update_known_words(self, known_words: Set[str]):
+        """
+        brings the known field of the keywords in line with known_words (words can also stop being known, e.g. if
+        their cards get reset or deleted) and adjusts the counts of only the sentences affected by the change
+        """
         if self._session is None:
             self._open_session()
-        existing_keywords = {kw[0] for kw in
-                             self._session.query(Keyword.keyword).filter(Keyword.keyword.in_(known_words)).all()}
-        new_keywords = [Keyword(keyword=word, known=True) for word in known_words if word not in existing_keywords]
-        self._session.query(Keyword).filter(Keyword.keyword.in_(existing_keywords)).update({"known": True},
-                                                                                           synchronize_session=False)
+        currently_known = {row[0] for row in self._session.execute(select(Keyword.keyword).where(Keyword.known))}
+        self.apply_known_changes(set(known_words) - currently_known, currently_known - set(known_words))
 
-        # keywords that aren't in any sentence in the db are inserted anyway - this is important so we can calculate
-        # comprehensibility for sentence search
-        if new_keywords:
-            self._session.add_all(new_keywords)
-
-        self._session.commit()
-        return
+    def apply_known_changes(self, newly_known: Set[str], newly_unknown: Set[str]):
+        """
+        marks the given words as known/unknown and shifts the known/unknown counts of the sentences containing them
+        by the number of their keywords that flipped, instead of recounting every sentence in the db
+        """
         if self._session is None:
             self._open_session()
-        self._session.query(Keyword).filter(Keyword.keyword.in_(known_words)).update({"known": True},
-                                                                                     synchronize_session=False)
-        self._session.commit()
+
+        # deltas only make sense on top of counts that are already right
+        if self._session.execute(select(Sentence.id).where(Sentence.n_known_words.is_(None)).limit(1)).first():
+            self._set_known_field(newly_known, True)
+            self._set_known_field(newly_unknown, False)
+            self._session.commit()
+            self.update_known_unknown_counts()
+            return
+
+        try:
+            keyword_deltas = {}
+            keyword_deltas.update({keyword_id: 1 for keyword_id in self._set_known_field(newly_known, True)})
+            keyword_deltas.update({keyword_id: -1 for keyword_id in self._set_known_field(newly_unknown, False)})
+            if keyword_deltas:
+                self._apply_keyword_deltas(keyword_deltas)
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+
+    def _set_known_field(self, keywords: Set[str], known: bool) -> List[int]:
+        # returns the ids of the keywords that actually flipped
+        flipped_ids = []
+        for keyword_batch in batched(keywords, self._max_query_parameters):
+            rows = self._session.execute(select(Keyword.id, Keyword.keyword, Keyword.known)
+                                         .where(Keyword.keyword.in_(keyword_batch))).all()
+            batch_flipped_ids = [row.id for row in rows if row.known != known]
+            if batch_flipped_ids:
+                self._session.execute(update(Keyword.__table__).where(Keyword.id.in_(batch_flipped_ids))
+                                      .values(known=known))
+            flipped_ids.extend(batch_flipped_ids)
+
+            # known words that aren't in any sentence in the db are inserted anyway - this is important so we can
+            # calculate comprehensibility for sentence search. (no sentences contain them, so no counts to adjust)
+            if known:
+                existing_keywords = {row.keyword for row in rows}
+                new_keywords = [keyword for keyword in keyword_batch if keyword not in existing_keywords]
+                if new_keywords:
+                    self._session.execute(insert(Keyword.__table__),
+                                          [{"keyword": keyword, "known": True} for keyword in new_keywords])
+        return flipped_ids
+
+    def _apply_keyword_deltas(self, keyword_deltas: Dict[int, int]):
+        # done in sql through temp tables, the keywords that flip in one go can easily be linked to 100k+ sentences
+        execute = lambda statement, *args: self._session.execute(text(statement), *args)
+        execute("CREATE TEMP TABLE IF NOT EXISTS keyword_known_deltas "
+                "(keyword_id INTEGER PRIMARY KEY, delta INTEGER NOT NULL)")
+        execute("CREATE TEMP TABLE IF NOT EXISTS sentence_known_deltas "
+                "(sentence_id INTEGER PRIMARY KEY, delta INTEGER NOT NULL)")
+        execute("DELETE FROM keyword_known_deltas")
+        execute("DELETE FROM sentence_known_deltas")
+        execute("INSERT INTO keyword_known_deltas (keyword_id, delta) VALUES (:keyword_id, :delta)",
+                [{"keyword_id": keyword_id, "delta": delta} for keyword_id, delta in keyword_deltas.items()])
+        # (sentence_keywords has one row per occurrence, so repeated keywords count as many times as they appear,
+        # same as in the full recount)
+        execute("INSERT INTO sentence_known_deltas (sentence_id, delta) "
+                "SELECT sk.sentence_id, SUM(d.delta) FROM sentence_keywords sk "
+                "JOIN keyword_known_deltas d ON sk.keyword_id = d.keyword_id "
+                "GROUP BY sk.sentence_id")
+        execute("UPDATE sentences SET "
+                "n_known_words = n_known_words + "
+                "(SELECT delta FROM sentence_known_deltas d WHERE d.sentence_id = sentences.id), "
+                "n_unknown_words = n_keywords - n_known_words - "
+                "(SELECT delta FROM sentence_known_deltas d WHERE d.sentence_id = sentences.id) "
+                "WHERE id IN (SELECT sentence_id FROM sentence_known_deltas)")
+        self._update_scores(only_sentences_in="SELECT sentence_id FROM sentence_known_deltas")
+        execute("DELETE FROM keyword_known_deltas")
+        execute("DELETE FROM sentence_known_deltas")
+
+    def get_known_keywords(self) -> FrozenSet[str]:
+        with self._read_session() as session:
+            return frozenset(row[0] for row in session.execute(select(Keyword.keyword).where(Keyword.known)))
 
     def get_known_keywords_subset(self, keywords: List[str]):
-        if self._session is None: self._open_session()
-        result = (
-            self._session.query(Keyword.keyword)
-                .distinct(Keyword.keyword)
-                .filter(Keyword.keyword.in_(keywords))
-                .filter(Keyword.known)
-                .all()
-        )
-        return result
\ No newline at end of file
+        with self._read_session() as session:
+            result = (
+                session.query(Keyword.keyword)
+                    .distinct(Keyword.keyword)
+                    .filter(Keyword.keyword.in_(keywords))
+                    .filter(Keyword.known)
+                    .all()
+            )
+            return result
\ No newline at end of file
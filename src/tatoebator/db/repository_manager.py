@@ -1,10 +1,10 @@
-from typing import List, Dict, Set, Optional, Callable
+from typing import List, Dict, Set, Optional, Callable, Tuple, Sequence, FrozenSet
 
 from ..audio import MediaManager
 from ..config import SENTENCES_PER_WORD
 from ..db.core import SentenceDbInterface
 from ..external_download_requester import ExternalDownloadRequester
-from ..language_processing import add_furigana_html
+from ..language_processing import add_furigana_html_many
 from ..sentences import CandidateExampleSentence
 from ..sentences import ExampleSentence
 from ..sentences import SentenceProducer
@@ -18,16 +18,29 @@ class SentenceRepository:
         self.media_manager = media_manager
         self._sentence_db_interface = SentenceDbInterface()
         self._sentence_producer = SentenceProducer(external_download_requester, self._create_sentence_search_config())
+        # min_comprehensibilities -> word -> counts. the gui asks for the same words over and over
+        self._sentence_count_cache: Dict[Tuple[float, ...], Dict[str, Tuple[int, ...]]] = {}
+        # known keywords as of the start of the search in progress, if any. scoring the candidates against this
+        # is a set intersection instead of a db query per sentence
+        self._known_keywords_snapshot: Optional[FrozenSet[str]] = None
 
     def _get_sentence_comprehensibility(self, sentence: CandidateExampleSentence) -> float:
-        words = sentence.lexical_words
-        known_words = self._sentence_db_interface.get_known_keywords_subset(words)
+        return self.get_sentence_comprehensibilities([sentence])[0]
+
+    def get_sentence_comprehensibilities(self, sentences: List[CandidateExampleSentence]) -> List[float]:
+        # proportion of each sentence's lexical words that are known
+        # against the snapshot during a search, otherwise one query for the whole batch
+        known_keywords = self._known_keywords_snapshot
+        if known_keywords is None:
+            words = list({word for sentence in sentences for word in sentence.lexical_words})
+            known_keywords = frozenset(row[0] for row in self._sentence_db_interface.get_known_keywords_subset(words))
         # just comprehensibility - no 2*trusted term like for the query ordering
-        return len(known_words) / len(words)
+        return [len(known_keywords.intersection(sentence.lexical_words)) / len(sentence.lexical_words)
+                for sentence in sentences]
 
     def _create_sentence_search_config(self) -> SentenceSearchConfig:
 
-        is_not_in_db = lambda s: self._sentence_db_interface.check_sentence(s.sentence, commit=False) is None
+        is_not_in_db = lambda s: not self._sentence_db_interface.contains_sentence(s.sentence)
 
         search_config = SentenceSearchConfig(
             SentenceScoringRequirements(
@@ -84,14 +97,54 @@ class SentenceRepository:
 
     def count_lexical_word_ocurrences(self, lexical_words: List[str],
                                       min_comprehensibility: Optional[float] = None) -> Dict[str, int]:
-        if min_comprehensibility is not None:
-            return self._sentence_db_interface \
-                .count_keywords_by_sentence_comprehensibility(lexical_words, min_comprehensibility)
-        return self._sentence_db_interface.count_keywords(lexical_words)
+        # through the same (cached) query as the histograms, so that the two always agree
+        min_comprehensibilities = (0 if min_comprehensibility is None else min_comprehensibility,)
+        counts = self.count_lexical_word_ocurrences_by_comprehensibility(lexical_words, min_comprehensibilities)
+        return {word: word_counts[0] for word, word_counts in counts.items()}
+
+    def count_lexical_word_ocurrences_by_comprehensibility(self, lexical_words: List[str],
+                                                           min_comprehensibilities: Sequence[float] = (0, 0.5, 0.8)) \
+            -> Dict[str, Tuple[int, ...]]:
+        """
+        for each word, the amt of sentences containing it w comprehensibility >= each of min_comprehensibilities
+        (i.e. a cumulative histogram). cached until sentences w the word are inserted or known words change
+        """
+        cache = self._sentence_count_cache.setdefault(tuple(min_comprehensibilities), {})
+        missing_words = [word for word in lexical_words if word not in cache]
+        if missing_words:
+            cache.update(self._sentence_db_interface.count_keywords_by_comprehensibility(missing_words,
+                                                                                         min_comprehensibilities))
+        return {word: cache[word] for word in lexical_words}
+
+    def count_candidate_sentences(self, words: List[str]) -> Dict[str, Optional[int]]:
+        # upper bound on the new sentences a search could find for each word (None if unknown), see SentenceProducer
+        return self._sentence_producer.count_candidate_sentences(words)
+
+    def _invalidate_sentence_counts(self, sentences: Optional[List[ExampleSentence]] = None):
+        # new sentences only affect the counts of their own words, known word changes can affect anything
+        if sentences is None:
+            self._sentence_count_cache.clear()
+            return
+        words = {word for sentence in sentences for word in sentence.lexical_words}
+        for cache in self._sentence_count_cache.values():
+            for word in words:
+                cache.pop(word, None)
+
+    def _insert_sentences(self, sentences: List[ExampleSentence]):
+        self._sentence_db_interface.insert_sentences_batched(sentences, verify_not_repeated=False)
+        self._invalidate_sentence_counts(sentences)
+
+    @property
+    def db_generation(self) -> str:
+        return self._sentence_db_interface.generation
 
     def update_known(self, known_words: Set[str]):
-        self._sentence_db_interface.update_known_field(known_words)
-        self._sentence_db_interface.update_known_unknown_counts()
+        self._sentence_db_interface.update_known_words(known_words)
+        self._invalidate_sentence_counts()
+
+    def apply_known_changes(self, newly_known: Set[str], newly_unknown: Set[str]):
+        self._sentence_db_interface.apply_known_changes(newly_known, newly_unknown)
+        self._invalidate_sentence_counts()
 
     def _produce_new_sentences_for_word(self, word: str, desired_amt: int, ensure_audio=False,
                                         progress_callback: Optional[Callable[..., None]] = None) \
@@ -112,8 +165,13 @@ class SentenceRepository:
         returns created sentences
         """
 
-        sentences = self._sentence_producer \
-            .find_new_sentences_with_words(word_desired_amts, progress_callback=progress_callback)
+        # known words don't change in the middle of a search as far as scoring is concerned
+        self._known_keywords_snapshot = self._sentence_db_interface.get_known_keywords()
+        try:
+            sentences = self._sentence_producer \
+                .find_new_sentences_with_words(word_desired_amts, progress_callback=progress_callback)
+        finally:
+            self._known_keywords_snapshot = None
         for sentence_group in sentences.values():
             for sentence in sentence_group:
                 if sentence.audio_file_ref is not None:
@@ -122,15 +180,16 @@ class SentenceRepository:
                 elif ensure_audio:
                     sentence.audio_file_ref = self.media_manager.create_audio_file(sentence.sentence)
 
-        all_sentences = sum(sentences.values(), [])
-        self._sentence_db_interface.insert_sentences_batched(all_sentences, verify_not_repeated=False)
+        # the same sentence may have been found for several of the words, but it only goes in the db once
+        all_sentences = list({sentence.sentence: sentence for sentence in sum(sentences.values(), [])}.values())
+        self._insert_sentences(all_sentences)
         return sentences
 
     def _ingest_starter_sentences(self,
                                   max_desired_sentences_per_word: int = SENTENCES_PER_WORD,
                                   block_size: int = 50):
         print("SentenceRepository ingesting base corpora...")
-        is_not_in_db = lambda s: self._sentence_db_interface.check_sentence(s.sentence, commit=False) is None
+        is_not_in_db = lambda s: not self._sentence_db_interface.contains_sentence(s.sentence)
         block = []
         sentence_text = set()
         for sentence in self._sentence_producer.yield_starter_sentences(filtering_fun=is_not_in_db):
@@ -150,14 +209,15 @@ class SentenceRepository:
                                                                                         sentence.audio_file_ref)
 
             if len(block) == block_size:
-                self._sentence_db_interface.insert_sentences_batched(block, verify_not_repeated=False)
+                self._insert_sentences(block)
                 block = []
                 sentence_text = set()
-        self._sentence_db_interface.insert_sentences_batched(block, verify_not_repeated=False)
+        self._insert_sentences(block)
 
     def _add_furigana(self, sentences):
-        for sentence in sentences:
-            sentence.furigana = add_furigana_html(sentence.sentence, ignore_unknown_words=True)
+        furiganas = add_furigana_html_many([sentence.sentence for sentence in sentences], ignore_unknown_words=True)
+        for sentence, furigana in zip(sentences, furiganas):
+            sentence.furigana = furigana
 
     def ensure_database_initialized(self):
         if not self._sentence_db_interface.count_n_sentences() > 0:
@@ -7,7 +7,7 @@ import tarfile
 import zipfile
 from asyncio import Protocol
 from enum import Enum
-from typing import Dict, List, Optional, Type, Tuple
+from typing import Dict, List, Optional, Type, Tuple, Callable
 from urllib import parse as parse_url
 
 from requests import Session
@@ -450,6 +450,12 @@ class ExternalDownloadRequester:
         self.user_has_refused_to_download = {downloadable_name: downloadable_name in refused_downloads
                                              for downloadable_name in self.all_downloadables}
 
+        self._download_listeners: List[Callable[[str], None]] = []
+
+    def add_download_listener(self, listener: Callable[[str], None]):
+        # called w the name of a downloadable whenever the user downloads it after being prompted
+        self._download_listeners.append(listener)
+
     def _load_refused_downloads(self):
         if os.path.exists(self._refused_downloads_path):
             with open(self._refused_downloads_path, "r") as f:
@@ -468,6 +474,8 @@ class ExternalDownloadRequester:
         elif prompt_user and not self.user_has_refused_to_download[downloadable_name]:
             self._prompt_user_for_download(downloadable_name)
             if downloadable.are_files_downloaded():
+                for listener in self._download_listeners:
+                    listener(downloadable_name)
                 return downloadable.item_filepaths
         return None
 
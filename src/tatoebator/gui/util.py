@@ -1,5 +1,9 @@
+from typing import List, Dict, Callable
+
 from PyQt6.QtWidgets import QMessageBox
 
+from ..db import SentenceRepository
+
 
 def ask_yes_no_question(question: str) -> bool:
     msg_box = QMessageBox()
@@ -9,3 +13,22 @@ def ask_yes_no_question(question: str) -> bool:
     no_button = msg_box.addButton("No", QMessageBox.ButtonRole.NoRole)
     msg_box.exec()
     return msg_box.clickedButton() == yes_button
+
+
+def skip_words_without_candidates(sentence_repository: SentenceRepository, words: List[str],
+                                  did_search_sentences: Dict[str, bool], on_change: Callable[[], None]) -> List[str]:
+    """
+    a search can't find anything for the words that no corpus has candidate sentences for - mark those as searched,
+    tell the user which they are and call on_change so the table can update whatever depends on that
+    returns the words that are left to search for
+    """
+    candidate_amts = sentence_repository.count_candidate_sentences(words)
+    words_without_candidates = [word for word in words if candidate_amts[word] == 0]
+    for word in words_without_candidates:
+        did_search_sentences[word] = True
+    on_change()
+    if words_without_candidates:
+        QMessageBox.information(None, "No sentences available",
+                                "None of the available corpora have sentences for these words, so they won't be "
+                                "searched for:\n" + ", ".join(words_without_candidates))
+    return [word for word in words if candidate_amts[word] != 0]
@@ -11,7 +11,7 @@ from .deck_select_dropdown import OutputDeckSelectionWidget
 from .default_gui_elements import SpecialColors
 from .gui_data_cache import GuiDataCache
 from .process_dialog import ProgressDialog
-from .util import ask_yes_no_question
+from .util import ask_yes_no_question, skip_words_without_candidates
 from .yomitan_intercept_table import MinedWordsTableWidget
 from ..anki_interfacing import AnkiDbInterface
 from ..config import SENTENCES_PER_WORD, SENTENCES_PER_CARD_BACK
@@ -272,11 +272,11 @@ class NewWordsTableWidget(QWidget):
         return self.table.item(idx, 0).checkState() == Qt.CheckState.Checked
 
     def _update_sentence_counts(self):
-        self._n_sentences_per_word = self.sentence_repository.count_lexical_word_ocurrences(self._words)
-        self._n_sentences_per_word_50 = self.sentence_repository \
-            .count_lexical_word_ocurrences(self._words, min_comprehensibility=0.5)
-        self._n_sentences_per_word_80 = self.sentence_repository \
-            .count_lexical_word_ocurrences(self._words, min_comprehensibility=0.8)
+        counts = self.sentence_repository.count_lexical_word_ocurrences_by_comprehensibility(self._words,
+                                                                                            (0, 0.5, 0.8))
+        self._n_sentences_per_word = {word: s00 for word, (s00, _, _) in counts.items()}
+        self._n_sentences_per_word_50 = {word: s50 for word, (_, s50, _) in counts.items()}
+        self._n_sentences_per_word_80 = {word: s80 for word, (_, _, s80) in counts.items()}
         self._update_sentence_counts_gui()
         self._update_sentence_button_highlighting()
 
@@ -296,6 +296,10 @@ class NewWordsTableWidget(QWidget):
         words_to_process = [word for idx, word in enumerate(self._words)
                             if self._is_idx_selected(idx) and not self._did_search_sentences[word]]
         if not words_to_process: return
+        words_to_process = skip_words_without_candidates(self.sentence_repository, words_to_process,
+                                                         self._did_search_sentences,
+                                                         self._update_sentence_button_highlighting)
+        if not words_to_process: return
         with ProgressDialog("Producing sentences...", 100) as progress:
 
             def progress_callback(aspm_name, search_ratio):
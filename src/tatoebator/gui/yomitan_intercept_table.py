@@ -15,7 +15,7 @@ from .deck_select_dropdown import OutputDeckSelectionWidget
 from .default_gui_elements import Colors, SpecialColors
 from .gui_data_cache import GuiDataCache
 from .toggle_switch import QToggle
-from .util import ask_yes_no_question
+from .util import ask_yes_no_question, skip_words_without_candidates
 from ..anki_interfacing import TatoebatorFields, AnkiDbInterface
 from ..config import SENTENCES_PER_CARD_BACK, SENTENCES_PER_WORD
 from ..constants import INTER_FIELD_SEPARATOR
@@ -194,6 +194,10 @@ class WordTableWidget(AutoResizeTableWidget):
         words_to_process = [word for idx, word in enumerate(self._words)
                             if self._is_idx_selected(idx) and not self._did_search_sentences[word]]
         if not words_to_process: return
+        words_to_process = skip_words_without_candidates(self.sentence_repository, words_to_process,
+                                                         self._did_search_sentences,
+                                                         self._maybe_signal_sentence_search_required_change)
+        if not words_to_process: return
         self.sentence_repository.produce_sentences_for_words({word: self._sentences_per_word_ideally
                                                               for word in words_to_process},
                                                              progress_callback=progress_callback)
@@ -305,19 +309,19 @@ class WordTableWidget(AutoResizeTableWidget):
                                         else SpecialColors.light_red)
 
     def _update_sentence_counts(self):
-        self._n_sentences_per_word = self.sentence_repository.count_lexical_word_ocurrences(self._words)
-        self._n_sentences_per_word_50 = self.sentence_repository \
-            .count_lexical_word_ocurrences(self._words, min_comprehensibility=0.5)
-        self._n_sentences_per_word_80 = self.sentence_repository \
-            .count_lexical_word_ocurrences(self._words, min_comprehensibility=0.8)
+        counts = self.sentence_repository.count_lexical_word_ocurrences_by_comprehensibility(self._words,
+                                                                                            (0, 0.5, 0.8))
+        self._n_sentences_per_word = {word: s00 for word, (s00, _, _) in counts.items()}
+        self._n_sentences_per_word_50 = {word: s50 for word, (_, s50, _) in counts.items()}
+        self._n_sentences_per_word_80 = {word: s80 for word, (_, _, s80) in counts.items()}
         self._maybe_signal_sentence_search_required_change()
 
     def _add_new_word_to_sentence_counts(self, word: str):
-        self._n_sentences_per_word.update(self.sentence_repository.count_lexical_word_ocurrences([word]))
-        self._n_sentences_per_word_50.update(self.sentence_repository \
-                                             .count_lexical_word_ocurrences([word], min_comprehensibility=0.5))
-        self._n_sentences_per_word_80.update(self.sentence_repository \
-                                             .count_lexical_word_ocurrences([word], min_comprehensibility=0.8))
+        s00, s50, s80 = self.sentence_repository.count_lexical_word_ocurrences_by_comprehensibility([word],
+                                                                                                   (0, 0.5, 0.8))[word]
+        self._n_sentences_per_word[word] = s00
+        self._n_sentences_per_word_50[word] = s50
+        self._n_sentences_per_word_80[word] = s80
         self._maybe_signal_sentence_search_required_change()
 
 
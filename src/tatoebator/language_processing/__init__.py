@@ -1,7 +1,10 @@
-from .furigana import add_furigana_plaintext, add_furigana_html
-from .lexical_analysis import lexical_content, grammaticalized_words, WordSpeechType, group_text_by_part_of_speech
-from .misc import japanese_chars_ratio, approximate_jp_root_form, estimate_jp_sentence_distance
+from .furigana import add_furigana_plaintext, add_furigana_html, add_furigana_html_many
+from .lexical_analysis import lexical_content, lexical_content_many, grammaticalized_words, WordSpeechType, group_text_by_part_of_speech
+from .misc import japanese_chars_ratio, approximate_jp_root_form, estimate_jp_sentence_distance, \
+    estimate_jp_sentence_distance_many
 from .morphological_analyzers import dictionary_form, DefaultTokenizer
 from .online_dictionaries import DefinitionFetcher, Definitions
 from .translator import Translator
+from .translation_backends import TranslationBackend, GoogleTranslationBackend, \
+    OfflineTranslationBackend
 from .unicode_ranges import UnicodeRange
@@ -5,7 +5,7 @@ from typing import List, Callable, Optional, Union
 
 import jaconv
 
-from .morphological_analyzers import DefaultTokenizer
+from .morphological_analyzers import DefaultTokenizer, Morpheme
 from .unicode_ranges import UnicodeRange as ur
 
 english_punctuation = r"\.,!\?;:\(\)\[\]{}'\"“”‘’@#$%^&*-_/+=<>|\~–—"
@@ -19,6 +19,8 @@ allowed_characters_matcher = re.compile(
 kanji_matcher = re.compile(fr"([{ur.kanji}々])", re.UNICODE)
 kanji_seq_matcher = re.compile(fr"([{ur.kanji}々]+)", re.UNICODE)
 
+_tokenizer = DefaultTokenizer()
+
 
 class MeCabProcessingError(Exception):
     """Raised when MeCab attempts to parse a word not in its dictionary."""
@@ -138,7 +140,7 @@ def _verify_no_unknown_characters(known_character_matcher: re.Pattern):
 @_verify_no_unknown_characters(allowed_characters_matcher)
 def _split_furigana_line(text: str,
                          ignore_unknown_words=False,
-                         tokenizer=DefaultTokenizer()  # function gets its own (unique) instance
+                         tokenizer=_tokenizer
                          ) -> TextWithFurigana:
     """
     Uses MeCab to tokenize input text and add furigana to the kanji within
@@ -148,9 +150,12 @@ def _split_furigana_line(text: str,
         if false, an error is thrown
     :return: TextWithFurigana, a list of strings and KanjiWithFurigana
     """
+    return _split_furigana_morphemes(tokenizer(text), ignore_unknown_words=ignore_unknown_words)
+
 
+def _split_furigana_morphemes(morphemes: List[Morpheme], ignore_unknown_words=False) -> TextWithFurigana:
     furiganized_text = []
-    for morpheme in tokenizer(text):
+    for morpheme in morphemes:
         surface = morpheme.surface
         if re.search(kanji_matcher, surface) is not None:
             kana = morpheme.reading
@@ -188,6 +193,29 @@ def split_furigana(text: str, ignore_unknown_words=False) -> TextWithFurigana:
     return result
 
 
+def split_furigana_many(texts: List[str], ignore_unknown_words=False) -> List[TextWithFurigana]:
+    """
+    Same as split_furigana, but for many texts at once - all of their lines go through MeCab in a single batch
+    :param texts: texts to be processed
+    :param ignore_unknown_words: if True, kanji where no reading is found will be left without furigana
+        if false, an error is thrown
+    :return: a TextWithFurigana for each text
+    """
+    splits_by_text = [re.split(allowed_characters_matcher, text) for text in texts]
+    lines_by_text = [re.findall(allowed_characters_matcher, text) for text in texts]
+    morphemes_by_line = iter(_tokenizer.tokenize_many([line for lines in lines_by_text for line in lines]))
+    results = []
+    for splits, lines in zip(splits_by_text, lines_by_text):
+        result = []
+        for split, _ in zip(splits, lines):
+            result.append(split)
+            result.extend(_split_furigana_morphemes(next(morphemes_by_line),
+                                                    ignore_unknown_words=ignore_unknown_words))
+        result.append(splits[-1])
+        results.append(result)
+    return results
+
+
 def add_furigana_plaintext(text: str, ignore_unknown_words=False) -> str:
     """
     adds furigana in parentheses to the kanji in the passed text
@@ -215,3 +243,12 @@ def add_furigana_html(text: str, furigana_size: Optional[float] = None, ignore_u
     """
     return repr_as_html(split_furigana(text, ignore_unknown_words=ignore_unknown_words),
                         furigana_size=furigana_size)
+
+
+def add_furigana_html_many(texts: List[str], furigana_size: Optional[float] = None,
+                           ignore_unknown_words=False) -> List[str]:
+    """
+    add_furigana_html for many texts at once (cheaper than calling it on each, see split_furigana_many)
+    """
+    return [repr_as_html(text_with_furigana, furigana_size=furigana_size)
+            for text_with_furigana in split_furigana_many(texts, ignore_unknown_words=ignore_unknown_words)]
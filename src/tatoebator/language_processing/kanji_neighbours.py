@@ -0,0 +1,114 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import FrozenSet, Optional
+
+
+class _RelatedKanji(dict):
+    # kanji -> related set (or None), filled in on first lookup. a dict so that lookups of kanji seen before stay in C
+    def __init__(self, table: "KanjiNeighbourTable"):
+        super().__init__()
+        self._table = table
+
+    def __missing__(self, kanji: str) -> Optional[FrozenSet[str]]:
+        related = self._table._read_related(kanji)
+        self[kanji] = related
+        return related
+
+
+class KanjiNeighbourTable:
+    """
+    binary, precompiled form of the "nearest" data in dembeddings.json, so that it doesn't have to be parsed (and
+    kept around as python dicts) to estimate sentence distances. built once from the json and kept next to it
+
+    file layout: size of the json at build time, amt of kanji, amt of neighbour entries (int64), then
+        codepoints          : int32, sorted
+        neighbour_starts    : int32, CSR layout, one more than the codepoints
+        neighbours          : int32 codepoints
+    read through mmap. the neighbour sets of the kanji that actually get looked up are kept as frozensets, in related
+    """
+
+    _header_format = 'qqq'
+
+    def __init__(self, source_filepath: str):
+        self.source_filepath = source_filepath
+        self.filepath = source_filepath + ".neighbours"
+        self._file = None
+        self._mmap = None
+        self._codepoints = None
+        self._neighbour_starts = None
+        self._neighbours = None
+        self.related = _RelatedKanji(self)
+
+    def is_up_to_date(self) -> bool:
+        if not os.path.exists(self.filepath):
+            return False
+        with open(self.filepath, 'rb') as f:
+            header = f.read(struct.calcsize(self._header_format))
+        return len(header) == struct.calcsize(self._header_format) \
+            and struct.unpack(self._header_format, header)[0] == os.path.getsize(self.source_filepath)
+
+    def build(self):
+        with open(self.source_filepath, "r") as f:
+            nearest = json.load(f)["nearest"]
+        codepoints, neighbour_starts, neighbours = array('i'), array('i', [0]), array('i')
+        for kanji in sorted(nearest, key=ord):
+            codepoints.append(ord(kanji))
+            neighbours.extend(map(ord, nearest[kanji]))
+            neighbour_starts.append(len(neighbours))
+        temp_filepath = self.filepath + ".partial"
+        with open(temp_filepath, 'wb') as f:
+            f.write(struct.pack(self._header_format, os.path.getsize(self.source_filepath),
+                                len(codepoints), len(neighbours)))
+            codepoints.tofile(f)
+            neighbour_starts.tofile(f)
+            neighbours.tofile(f)
+        os.replace(temp_filepath, self.filepath)
+
+    def open(self):
+        self._file = open(self.filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, n_kanji, n_neighbours = struct.unpack_from(self._header_format, self._mmap, 0)
+        view = memoryview(self._mmap)
+        start = struct.calcsize(self._header_format)
+        columns = []
+        for length in [n_kanji, n_kanji + 1, n_neighbours]:
+            end = start + length * array('i').itemsize
+            columns.append(view[start:end].cast('i'))
+            start = end
+        self._codepoints, self._neighbour_starts, self._neighbours = columns
+        view.release()
+        return self
+
+    def close(self):
+        # the views have to go before the mmap can be closed
+        for column in [self._codepoints, self._neighbour_starts, self._neighbours]:
+            if column is not None: column.release()
+        if self._mmap is not None: self._mmap.close()
+        if self._file is not None: self._file.close()
+        self._codepoints = self._neighbour_starts = self._neighbours = self._mmap = self._file = None
+        self.related = _RelatedKanji(self)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._codepoints)
+
+    def get(self, kanji: str) -> Optional[FrozenSet[str]]:
+        # the kanji's neighbours plus the kanji itself - i.e. the kanji at distance 0 from it. None if unknown
+        return self.related[kanji]
+
+    def _read_related(self, kanji: str) -> Optional[FrozenSet[str]]:
+        codepoint = ord(kanji)
+        idx = bisect_left(self._codepoints, codepoint)
+        if idx < len(self._codepoints) and self._codepoints[idx] == codepoint:
+            neighbours = self._neighbours[self._neighbour_starts[idx]:self._neighbour_starts[idx + 1]]
+            return frozenset(map(chr, neighbours)).union(kanji)
+        return None
@@ -2,9 +2,11 @@ import re
 from enum import Enum
 from typing import List, Dict, Set
 
+from .lexical_content_cache import LexicalContentCache
 from .morphological_analyzers import DefaultTokenizer, Morpheme
 
 tokenizer = DefaultTokenizer()
+lexical_content_cache = LexicalContentCache()
 
 _punctuation_tags = {'記号'}
 
@@ -57,7 +59,29 @@ def group_text_by_part_of_speech(text) -> Dict[WordSpeechType, Set[str]]:
     return classified
 
 
-def lexical_content(text):
+def _lexical_content_from_morphemes(morphemes: List[Morpheme]) -> List[str]:
     return [m.dictionary_form
-            for m in tokenizer(text)
+            for m in morphemes
             if _classify_morpheme(m) == WordSpeechType.LEXICAL_WORD]
+
+
+def lexical_content(text):
+    # the same sentences come up again and again over searches/ingestions, so this is cached on disk
+    lexical_words = lexical_content_cache.get(text)
+    if lexical_words is None:
+        lexical_words = _lexical_content_from_morphemes(tokenizer(text))
+        lexical_content_cache.put(text, lexical_words)
+    return lexical_words
+
+
+def lexical_content_many(texts: List[str], use_cache: bool = True) -> List[List[str]]:
+    # same as lexical_content, but the texts that aren't cached go through the tokenizer all at once
+    if not use_cache:
+        return [_lexical_content_from_morphemes(morphemes) for morphemes in tokenizer.tokenize_many(texts)]
+    lexical_words_by_text = [lexical_content_cache.get(text) for text in texts]
+    missing_idxs = [idx for idx, lexical_words in enumerate(lexical_words_by_text) if lexical_words is None]
+    missing_morphemes = tokenizer.tokenize_many([texts[idx] for idx in missing_idxs])
+    for idx, morphemes in zip(missing_idxs, missing_morphemes):
+        lexical_words_by_text[idx] = _lexical_content_from_morphemes(morphemes)
+        lexical_content_cache.put(texts[idx], lexical_words_by_text[idx])
+    return lexical_words_by_text
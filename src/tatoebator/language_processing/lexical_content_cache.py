@@ -0,0 +1,110 @@
+import atexit
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict
+
+from ..constants import PATH_TO_LEXICAL_CONTENT_CACHE
+from ..util import deterministic_hash
+
+
+class LexicalContentCache:
+    """
+    persistent cache of the lexical content of sentences, so that sentences that have been seen before (e.g. on a
+    previous search through the same corpus) don't have to go through mecab again
+
+    keyed by (a prefix of) deterministic_hash of the sentence. sits on a sqlite file w/ a small LRU dict in front.
+    writes are buffered and go to disk every so often - call flush() to force them out. the file holds at most
+    _max_entries sentences - past that the oldest ones are evicted, same as in TranslationCache
+
+    the version is stored in the file - bump it whenever the computation of lexical content changes (tokenizer,
+    classification of morphemes...) so stale entries aren't reused
+
+    the connection is opened lazily and per process, so that the module-level instance can be used from the
+    sharded search's worker processes too
+    """
+
+    _version = "2"
+    _separator = "\t"  # dictionary forms never contain tabs
+    _memory_size = 100_000
+    _max_entries = 1_000_000  # a bit over 100 bytes each
+    _flush_every = 2000
+
+    def __init__(self, filepath: str = PATH_TO_LEXICAL_CONTENT_CACHE):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._memory: OrderedDict[str, List[str]] = OrderedDict()
+        self._pending: Dict[str, str] = {}
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return deterministic_hash(text)[:32]
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is not None and self._connection_pid == os.getpid():
+            return self._connection
+        # inherited from a parent process (or never opened)
+        self._pending.clear()
+        os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+        connection = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != self._version:
+            # dropped rather than emptied, in case the layout of the table changed too
+            connection.execute("DROP TABLE IF EXISTS lexical_content")
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (self._version,))
+        # rowid gives the order of insertion, for eviction
+        connection.execute("CREATE TABLE IF NOT EXISTS lexical_content "
+                           "(key TEXT UNIQUE NOT NULL, lexical_words TEXT NOT NULL)")
+        connection.commit()
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
+
+    def _remember(self, key: str, lexical_words: List[str]):
+        self._memory[key] = lexical_words
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[List[str]]:
+        key = self._key(text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return list(self._memory[key])
+            row = self._get_connection().execute("SELECT lexical_words FROM lexical_content WHERE key = ?",
+                                                 (key,)).fetchone()
+            if row is None:
+                return None
+            lexical_words = row[0].split(self._separator) if row[0] else []
+            self._remember(key, lexical_words)
+            return list(lexical_words)
+
+    def put(self, text: str, lexical_words: List[str]):
+        key = self._key(text)
+        with self._lock:
+            self._get_connection()
+            self._remember(key, list(lexical_words))
+            self._pending[key] = self._separator.join(lexical_words)
+            if len(self._pending) >= self._flush_every:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending: return
+        self._connection.executemany("INSERT OR REPLACE INTO lexical_content (key, lexical_words) VALUES (?, ?)",
+                                     self._pending.items())
+        self._connection.execute("DELETE FROM lexical_content "
+                                 "WHERE rowid <= (SELECT MAX(rowid) FROM lexical_content) - ?", (self._max_entries,))
+        self._connection.commit()
+        self._pending.clear()
+
+    def flush(self):
+        with self._lock:
+            if self._connection is not None and self._connection_pid == os.getpid():
+                self._flush()
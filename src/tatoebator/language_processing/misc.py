@@ -1,8 +1,9 @@
-import json
 import os
 import re
 from functools import cached_property
+from typing import Iterable, List, Tuple
 
+from .kanji_neighbours import KanjiNeighbourTable
 from .unicode_ranges import UnicodeRange as ur, UnicodeRange
 from ..constants import PATH_TO_OTHER_DATA
 
@@ -24,23 +25,30 @@ class _JpSentenceSimilarityEstimator:
         self.path = os.path.join(PATH_TO_OTHER_DATA, "dembeddings.json")
 
     @cached_property
-    def related_pairs(self):
-        with open(self.path, "r") as f:
-            distances = json.load(f)["nearest"]
-        return {kanji: list(close_kanji.keys()) for kanji, close_kanji in distances.items()}
+    def kanji_neighbours(self) -> KanjiNeighbourTable:
+        # compiled from the json the first time around (and whenever it changes)
+        table = KanjiNeighbourTable(self.path)
+        if not table.is_up_to_date():
+            table.build()
+        return table.open()
 
     def distance(self, k1, k2):
-        if k1 == k2: return 0
-        neighbors = self.related_pairs.get(k1, None)
-        if neighbors is None: return 0  # ignore unknown kanji (obs. this dist is not symmetric)
-        return int(k2 not in neighbors)
+        related = self.kanji_neighbours.get(k1)
+        if related is None: return 0  # ignore unknown kanji (obs. this dist is not symmetric)
+        return int(k2 not in related)
 
     def distance_one_to_many(self, k, ks):
-        return min((self.distance(k, k2) for k2 in ks))
+        # ks is best passed as a set
+        related = self.kanji_neighbours.get(k)
+        if related is None: return 0
+        return int(related.isdisjoint(ks))
 
     def distance_many_to_many(self, ks1, ks2):
-        return (sum((self.distance_one_to_many(k1, ks2) for k1 in ks1))
-                + sum((self.distance_one_to_many(k2, ks1) for k2 in ks2)))
+        get_related = self.kanji_neighbours.related.__getitem__
+        set_1, set_2 = set(ks1), set(ks2)
+        # (repeated kanji count once per appearance)
+        return (sum(related is not None and related.isdisjoint(set_2) for related in map(get_related, ks1))
+                + sum(related is not None and related.isdisjoint(set_1) for related in map(get_related, ks2)))
 
     def distance_sentences(self, jp_text_1, jp_text_2):
         kanji_1 = self.kanji_matcher.findall(jp_text_1)
@@ -49,5 +57,20 @@ class _JpSentenceSimilarityEstimator:
             return 1  # will catch a lot of good sentences but cannot be helped
         return self.distance_many_to_many(kanji_1, kanji_2) / max(10, len(kanji_1) + len(kanji_2))
 
-
-estimate_jp_sentence_distance = _JpSentenceSimilarityEstimator().distance_sentences
+    def distance_sentences_many(self, text_pairs: Iterable[Tuple[str, str]]) -> List[float]:
+        # distance_sentences for a whole batch (e.g. sentences and the machine translations of their translations)
+        findall = self.kanji_matcher.findall
+        distance_many_to_many = self.distance_many_to_many
+        distances = []
+        for jp_text_1, jp_text_2 in text_pairs:
+            kanji_1, kanji_2 = findall(jp_text_1), findall(jp_text_2)
+            if not (kanji_1 and kanji_2):
+                distances.append(1)
+            else:
+                distances.append(distance_many_to_many(kanji_1, kanji_2) / max(10, len(kanji_1) + len(kanji_2)))
+        return distances
+
+
+_jp_sentence_similarity_estimator = _JpSentenceSimilarityEstimator()
+estimate_jp_sentence_distance = _jp_sentence_similarity_estimator.distance_sentences
+estimate_jp_sentence_distance_many = _jp_sentence_similarity_estimator.distance_sentences_many
@@ -1,5 +1,6 @@
 import os
 import subprocess
+import threading
 from dataclasses import dataclass
 from typing import List, Set, Optional
 
@@ -19,6 +20,10 @@ class Tokenizer:
     def __call__(self, text: str) -> List[Morpheme]:
         raise NotImplementedError()
 
+    def tokenize_many(self, texts: List[str]) -> List[List[Morpheme]]:
+        # subclasses for which there is a cheaper way to do this should override it
+        return [self(text) for text in texts]
+
 
 forced_utf8_env = os.environ.copy()
 forced_utf8_env["PYTHONUTF8"] = "1"
@@ -121,8 +126,8 @@ else:
 running_as_anki_addon = lambda: True
 
 if running_as_anki_addon():
-    from ..subprocesses import TimedResourceManager
-    from ..config import MECAB_EXE
+    from ..subprocesses import TimedResourceManager, TimedResourcePool
+    from ..config import MECAB_EXE, MECAB_PROCESSES
 
 
     def _process_mecab_cli_output_line(line: str) -> Morpheme:
@@ -139,6 +144,10 @@ if running_as_anki_addon():
 
 
     class MeCabResource(TimedResourceManager):
+        # one pipe - requests can't interleave
+        _serialize_requests = True
+        _direct_write_max_chars = 1024  # at most 4 bytes each in utf-8, so these fit even in a 4KB pipe buffer
+
         def _start_resource(self):
             mecab_path, mecab_exe = os.path.split(MECAB_EXE)
             self._process = subprocess.Popen([mecab_exe],
@@ -156,21 +165,55 @@ if running_as_anki_addon():
             self._process.terminate()
             self._process.wait()
 
-        def _process_request(self, text):
-            text = text.replace("\n", " ")
-            self._process.stdin.write(text + "\n")
+        def _write_lines(self, lines: str):
+            self._process.stdin.write(lines)
             self._process.stdin.flush()
-            # grab items from readline until EOS
-            return iter(self._process.stdout.readline, "EOS\n")
+
+        def _read_until_eos(self) -> List[str]:
+            output = []
+            while (line := self._process.stdout.readline()) != "EOS\n":
+                if not line:
+                    raise Exception("MeCab process closed its output unexpectedly")
+                output.append(line)
+            return output
+
+        def _process_request(self, texts: List[str]) -> List[List[str]]:
+            # one line per text (so a linebreak within a text would throw off the whole batch)
+            lines = "".join(text.replace("\r", " ").replace("\n", " ") + "\n" for text in texts)
+            # mecab stops reading input when its output pipe is full, so writing the whole block before reading
+            # anything back could deadlock - write from another thread instead. unless it fits in the input pipe's
+            # buffer, in which case the write can't block (and most requests are one short sentence)
+            if len(lines) <= self._direct_write_max_chars:
+                self._write_lines(lines)
+                writer = None
+            else:
+                writer = threading.Thread(target=self._write_lines, args=(lines,), daemon=True)
+                writer.start()
+            # each text's output ends in an EOS line
+            outputs = [self._read_until_eos() for _ in texts]
+            if writer is not None: writer.join()
+            return outputs
+
+
+    # shared by all tokenizers, so that concurrent callers (search threads, furigana, gui) each get a process
+    _mecab_pool = TimedResourcePool(MeCabResource, MECAB_PROCESSES)
 
 
     class MeCabTokenizer(Tokenizer):
+        _batch_size = 1000  # texts sent down the pipe at once
+
         def __init__(self):
-            self._mecab_resource = MeCabResource()
+            self._mecab_resource = _mecab_pool
 
         def __call__(self, text):
-            output = self._mecab_resource.process_request_managed(text)
-            return list(map(_process_mecab_cli_output_line, output))
+            return self.tokenize_many([text])[0]
+
+        def tokenize_many(self, texts):
+            morphemes = []
+            for start in range(0, len(texts), self._batch_size):
+                outputs = self._mecab_resource.process_request_managed(texts[start:start + self._batch_size])
+                morphemes.extend(list(map(_process_mecab_cli_output_line, output)) for output in outputs)
+            return morphemes
 
 
     """
@@ -192,7 +235,7 @@ else:
     import MeCab
 
 
-    class MeCabTokenizer:
+    class MeCabTokenizer(Tokenizer):
         def __init__(self):
             self._tagger = MeCab.Tagger("-Ochasen")
 
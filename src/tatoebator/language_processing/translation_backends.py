@@ -0,0 +1,59 @@
+import asyncio
+from typing import Dict, Tuple, Iterable, Optional
+
+from googletrans import Translator as GoogleTranslator
+
+
+class TranslationBackend:
+    """
+    what actually does the translating for Translator. one instance is only ever used from the translator's
+    event loop, so implementations can hold on to loop-bound things (http clients etc.)
+    texts may have several lines - each line has to come back as one line
+    """
+
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        raise NotImplementedError()
+
+
+class GoogleTranslationBackend(TranslationBackend):
+    # used to fail when we used the same translator object for different requests
+    # seems not to happen anymore but we keep raise_exception=True to investigate - when we learn something about
+    # exceptions we will be able to handle them... retrying a couple times, re-instantiating the TL object maybe
+
+    def __init__(self):
+        self._google_translator = GoogleTranslator(raise_exception=True)
+
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        translation = await self._google_translator.translate(text, src=src, dest=dest)
+        return translation.text
+
+
+class OfflineTranslationBackend(TranslationBackend):
+    """
+    deterministic, table-driven stand-in for an actual translator, so the translation pipeline can be run (and
+    timed) without network. lines found in the table get their translation, anything else comes back tagged w the
+    destination language (so it won't pass a round trip check). latency simulates the time a request takes
+
+    e.g. filling the table w the pairs of a corpus makes every sentence in it survive translation evaluation
+    """
+
+    def __init__(self, table: Optional[Dict[Tuple[str, str], Dict[str, str]]] = None, latency: float = 0):
+        # (src, dest) -> text -> translation
+        self._table = table or {}
+        self.latency = latency
+        self.amt_requests = 0
+
+    def add_pairs(self, pairs: Iterable[Tuple[str, str]], src: str = 'ja', dest: str = 'en'):
+        # fills both directions
+        forward = self._table.setdefault((src, dest), {})
+        backward = self._table.setdefault((dest, src), {})
+        for text, translation in pairs:
+            forward[text] = translation
+            backward[translation] = text
+
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        self.amt_requests += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        table = self._table.get((src, dest), {})
+        return "\n".join(table.get(line, f"[{dest}] {line}") for line in text.split("\n"))
@@ -0,0 +1,94 @@
+import atexit
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from ..constants import PATH_TO_TRANSLATION_CACHE
+from ..util import deterministic_hash
+
+
+class TranslationCache:
+    """
+    persistent cache of machine translations, so that sentences that went through the translator on a previous
+    search (or before a crash) don't need another request
+
+    keyed by the direction of the translation and (a prefix of) deterministic_hash of the text. same setup as
+    LexicalContentCache: a sqlite file w/ a small LRU dict in front, writes buffered and flushed every so often
+
+    the file holds at most _max_entries translations - past that the oldest ones are evicted. an entry that gets
+    written again (e.g. a retranslation) counts as new
+    """
+
+    _memory_size = 10_000
+    _max_entries = 200_000
+    _flush_every = 50  # translations are slow to come by, so don't sit on them for long
+
+    def __init__(self, filepath: str = PATH_TO_TRANSLATION_CACHE):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._pending: Dict[str, str] = {}
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _key(text: str, src: str, dest: str) -> str:
+        return f"{src}>{dest}:{deterministic_hash(text)[:32]}"
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            connection = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # rowid gives the order of insertion, for eviction
+            connection.execute("CREATE TABLE IF NOT EXISTS translations "
+                               "(key TEXT UNIQUE NOT NULL, translation TEXT NOT NULL)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _remember(self, key: str, translation: str):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, src: str, dest: str) -> Optional[str]:
+        key = self._key(text, src, dest)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key in self._pending:
+                return self._pending[key]
+            row = self._get_connection().execute("SELECT translation FROM translations WHERE key = ?",
+                                                 (key,)).fetchone()
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, text: str, src: str, dest: str, translation: str):
+        key = self._key(text, src, dest)
+        with self._lock:
+            self._remember(key, translation)
+            self._pending[key] = translation
+            if len(self._pending) >= self._flush_every:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending: return
+        connection = self._get_connection()
+        # (replacing deletes the old row, so the entry moves to the back of the eviction order)
+        connection.executemany("INSERT OR REPLACE INTO translations (key, translation) VALUES (?, ?)",
+                               self._pending.items())
+        connection.execute("DELETE FROM translations WHERE rowid <= (SELECT MAX(rowid) FROM translations) - ?",
+                           (self._max_entries,))
+        connection.commit()
+        self._pending.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
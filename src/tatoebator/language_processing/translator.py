@@ -1,35 +1,99 @@
 import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, Any, Optional, List
 
-from googletrans import Translator as GoogleTranslator
+from .translation_backends import TranslationBackend, GoogleTranslationBackend
+from .translation_cache import TranslationCache
 
 
 class Translator:
 
-    # used to fail when we used the same translator object for different requests
-    # seems not to happen anymore but we keep raise_exception=True to investigate - when we learn something about
-    # exceptions we will be able to handle them... retrying a couple times, re-instantiating the TL object maybe
-
     # also have to experiment with how much leeway we have before hitting the rate limit
     # try w sync v async and long v short sentences. eng -> so entropy per character remains stable
     # i'm assuming the rate limit will be linear in these 4 vars, so if we know them we can endow this class w
     # the capacity to estimate how many requests it has left - so it can warn the gui if relevant
 
-    def __init__(self):
-        self._google_translator = GoogleTranslator(raise_exception=True)
+    # all requests go through one event loop on its own thread and one backend (so one connection pool)
+    # the semaphore bounds how many requests are in flight at once, whoever they come from
+    max_concurrent_requests = 20
+
+    def __init__(self, max_concurrent_requests: Optional[int] = None, backend: Optional[TranslationBackend] = None,
+                 cache: Optional[TranslationCache] = None):
+        if max_concurrent_requests is not None:
+            self.max_concurrent_requests = max_concurrent_requests
+        # google by default. the persistent cache is only used by default w google, so other backends (e.g. the
+        # offline one, for benchmarks) neither pollute it nor get answered from it
+        self._backend = backend or GoogleTranslationBackend()
+        self._cache = cache if cache is not None else (TranslationCache() if backend is None else None)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="translator loop").start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coroutine: Coroutine[Any, Any, Any]) -> Future:
+        # runs a coroutine on the translator's loop - use this for anything that awaits the async methods below
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop())
+
+    async def _request(self, text: str, src: str, dest: str) -> str:
+        # (created here so it belongs to the translator loop)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        async with self._semaphore:
+            return await self._backend.translate(text, src, dest)
+
+    async def _translate(self, text: str, src: str, dest: str, use_cache: bool) -> str:
+        # use_cache=False still stores the result - it's for when the cached translation is the problem
+        # (translation isn't deterministic, a retry should get a fresh one)
+        if self._cache is None:
+            return await self._request(text, src, dest)
+        if use_cache:
+            translation = self._cache.get(text, src, dest)
+            if translation is not None:
+                return translation
+        translation = await self._request(text, src, dest)
+        self._cache.put(text, src, dest, translation)
+        return translation
+
+    async def _translate_many(self, texts: List[str], src: str, dest: str, use_cache: bool) -> Optional[List[str]]:
+        # one request for all the texts that aren't cached, joined by newlines
+        # None if the translation doesn't come back w one line per text (nothing is cached then)
+        use_cache = use_cache and self._cache is not None
+        translations = [self._cache.get(text, src, dest) if use_cache else None for text in texts]
+        missing = [idx for idx, translation in enumerate(translations) if translation is None]
+        if missing:
+            requested = (await self._request("\n".join(texts[idx] for idx in missing), src, dest)).split("\n")
+            if len(requested) != len(missing):
+                return None
+            for idx, translation in zip(missing, requested):
+                translations[idx] = translation
+                if self._cache is not None:
+                    self._cache.put(texts[idx], src, dest, translation)
+        return translations
+
+    # sync methods just block on the translator loop. don't call them from inside it
+    def jp_to_eng(self, text: str, use_cache: bool = True):
+        return self.submit(self.async_jp_to_eng(text, use_cache=use_cache)).result()
+
+    def eng_to_jp(self, text: str, use_cache: bool = True):
+        return self.submit(self.async_eng_to_jp(text, use_cache=use_cache)).result()
 
-    # sync methods just instantiate a new translator to avoid having to worry abt the event loop
-    def jp_to_eng(self, text: str):
-        translation = asyncio.run(GoogleTranslator(raise_exception=True).translate(text, src='ja', dest='en'))
-        return translation.text
+    # these have to be awaited on the translator loop, see submit
+    async def async_jp_to_eng(self, text: str, use_cache: bool = True):
+        return await self._translate(text, 'ja', 'en', use_cache)
 
-    def eng_to_jp(self, text: str):
-        translation = asyncio.run(GoogleTranslator(raise_exception=True).translate(text, src='en', dest='ja'))
-        return translation.text
+    async def async_eng_to_jp(self, text: str, use_cache: bool = True):
+        return await self._translate(text, 'en', 'ja', use_cache)
 
-    async def async_jp_to_eng(self, text: str):
-        translation = await self._google_translator.translate(text, src='ja', dest='en')
-        return translation.text
+    async def async_jp_to_eng_many(self, texts: List[str], use_cache: bool = True) -> Optional[List[str]]:
+        return await self._translate_many(texts, 'ja', 'en', use_cache)
 
-    async def async_eng_to_jp(self, text: str):
-        translation = await self._google_translator.translate(text, src='en', dest='ja')
-        return translation.text
+    async def async_eng_to_jp_many(self, texts: List[str], use_cache: bool = True) -> Optional[List[str]]:
+        return await self._translate_many(texts, 'en', 'ja', use_cache)
@@ -2,13 +2,14 @@ import logging
 import os
 import re
 from enum import Enum
-from functools import cached_property
+from functools import cached_property, lru_cache
 from typing import Optional, List
 
 from ..constants import PATH_TO_LOGS
 from ..language_processing import Translator
 from ..language_processing import UnicodeRange as ur
-from ..language_processing import lexical_content, estimate_jp_sentence_distance
+from ..language_processing import lexical_content, lexical_content_many, estimate_jp_sentence_distance, \
+    estimate_jp_sentence_distance_many
 
 
 class CandidateExampleSentence:
@@ -58,6 +59,13 @@ class CandidateExampleSentence:
         return len(self.lexical_words)
 
 
+def compute_lexical_words_many(sentences: List[CandidateExampleSentence]):
+    # fills in lexical_words for many sentences at once - one trip to mecab instead of one per sentence
+    pending = [s for s in sentences if "lexical_words" not in s.__dict__ and not s._lexical_words]
+    for sentence, lexical_words in zip(pending, lexical_content_many([s.sentence for s in pending])):
+        sentence.lexical_words = lexical_words
+
+
 discarded_sentences_logger = logging.getLogger("tatoebator.discarded_sentences")
 discarded_sentences_logger.setLevel(logging.INFO)
 discarded_sentences_logger.addHandler(logging.FileHandler(os.path.join(PATH_TO_LOGS, "discarded_sentences.log"),
@@ -78,6 +86,56 @@ _known_japanese_text_matcher = re.compile(
     fr"[{ur.hiragana}{ur.katakana}{ur.kanji}" + _japanese_punctuation + _other_full_width_chars + "]+")
 _known_english_text_matcher = re.compile(r"[a-zA-Z0-9" + _english_punctuation + "]+")
 
+# the filters below mostly ask per-character questions (is it japanese, is it a known char...) of the same text
+# so for the compiled filters every character is classified once into a bitmask of these categories
+_STRICTLY_JAPANESE = 1
+_KNOWN_CHARACTER = 2
+_KNOWN_JAPANESE = 4
+_KNOWN_ENGLISH = 8
+_NEWLINE_OR_TAB = 16
+_category_matchers = [(_STRICTLY_JAPANESE, _strictly_japanese_chars_matcher),
+                      (_KNOWN_CHARACTER, _known_characters_text_matcher),
+                      (_KNOWN_JAPANESE, _known_japanese_text_matcher),
+                      (_KNOWN_ENGLISH, _known_english_text_matcher),
+                      (_NEWLINE_OR_TAB, _newline_or_tab_matcher)]
+
+
+class _CharacterCategories(dict):
+    # codepoint -> categories, filled in as characters are first seen by asking the same regexes the reference
+    # filters use, so the two always agree. used as a str.translate table so classifying a text happens in C
+    def __missing__(self, codepoint: int) -> int:
+        char = chr(codepoint)
+        categories = sum(category for category, matcher in _category_matchers if matcher.fullmatch(char))
+        self[codepoint] = categories
+        return categories
+
+
+_character_categories = _CharacterCategories()
+
+
+class _TextProfile:
+    __slots__ = ("length", "n_strictly_japanese", "any_categories", "all_categories", "has_format_tags")
+
+    def __init__(self, text: str):
+        classified = text.translate(_character_categories)
+        masks = [ord(mask) for mask in set(classified)]
+        self.length = len(text)
+        self.n_strictly_japanese = sum(classified.count(chr(mask)) for mask in masks if mask & _STRICTLY_JAPANESE)
+        self.any_categories = 0
+        self.all_categories = -1 if masks else 0  # an empty text doesn't fullmatch anything
+        for mask in masks:
+            self.any_categories |= mask
+            self.all_categories &= mask
+        # every format tag has one of these in it - skip the regex when none are there
+        self.has_format_tags = ("<" in text or "nbsp" in text or "&quot;" in text) \
+            and _format_tags_matcher.search(text) is not None
+
+
+@lru_cache(maxsize=4096)
+def _text_profile(text: str) -> _TextProfile:
+    # cached b/c the same sentence usually gets evaluated once per word found in it
+    return _TextProfile(text)
+
 
 class QualityEvaluationResult(Enum):
     UNSUITABLE = -1
@@ -86,6 +144,13 @@ class QualityEvaluationResult(Enum):
 
 
 class ExampleSentenceQualityEvaluator:
+    """
+    the filters are written twice: the plain ones below (one regex pass per filter - the reference, and easy to
+    read) and compiled ones that take profiles of the sentence and translation, where every character has been
+    classified just once. both are run by the same code so results and logs are identical;
+    evaluate_quality_reference is there to check that
+    """
+
     _pre_translation_filters = {
         "Not too short": lambda s: s.sentence_len > 5,
         "Not too long": lambda s: s.sentence_len <= 140,
@@ -114,12 +179,88 @@ class ExampleSentenceQualityEvaluator:
                                                                         s.translation) is not None,
     }
 
+    # same names, same order. take (c.e.sentence, sentence profile, translation profile)
+    _compiled_pre_translation_filters = {
+        "Not too short": lambda s, sp: sp.length > 5,
+        "Not too long": lambda s, sp: sp.length <= 140,
+        "Sufficient japanese characters": lambda s, sp: sp.n_strictly_japanese / sp.length > 0.7,
+        "No weird format tags": lambda s, sp: not sp.has_format_tags,
+        "No linebreaks or tabs": lambda s, sp: not sp.any_categories & _NEWLINE_OR_TAB,
+        "No unknown characters": lambda s, sp: bool(sp.all_categories & _KNOWN_CHARACTER),
+        "No unpaired double quotes": lambda s, sp: s.sentence.count('"') % 2 == 0,
+    }
+
+    _compiled_post_translation_filters = {
+        "No japanese in translation": lambda s, sp, tp: not tp.any_categories & _STRICTLY_JAPANESE,
+        "No weird format tags in translation": lambda s, sp, tp: not tp.has_format_tags,
+        "No linebreaks or tabs in translation": lambda s, sp, tp: not tp.any_categories & _NEWLINE_OR_TAB,
+        "No unknown characters in translation": lambda s, sp, tp: bool(tp.all_categories & _KNOWN_CHARACTER),
+        "At least two lexical words": lambda s, sp, tp: s.n_lexical_words >= 2,
+    }
+
+    _compiled_extra_quality_filters = {
+        "Not too many lexical words": lambda s, sp, tp: s.n_lexical_words <= 20,
+        "No english characters": lambda s, sp, tp: bool(sp.all_categories & _KNOWN_JAPANESE),
+        "No japanese characters in translation": lambda s, sp, tp: bool(tp.all_categories & _KNOWN_ENGLISH),
+    }
+
+    @classmethod
+    def passes_pre_translation_filters(cls, example_sentence: CandidateExampleSentence) -> bool:
+        sentence_profile = _text_profile(example_sentence.sentence)
+        return all(filter_fun(example_sentence, sentence_profile)
+                   for filter_fun in cls._compiled_pre_translation_filters.values())
+
+    @classmethod
+    def passes_pre_translation_filters_many(cls, example_sentences: List[CandidateExampleSentence]) -> List[bool]:
+        return [cls.passes_pre_translation_filters(example_sentence) for example_sentence in example_sentences]
+
     @classmethod
     def evaluate_quality(cls, example_sentence: CandidateExampleSentence, word: Optional[str] = None, log=False) \
             -> QualityEvaluationResult:
+        return cls._evaluate_quality(example_sentence, word, log, compiled=True)
 
-        for filter_name, filter_fun in cls._pre_translation_filters.items():
-            if not filter_fun(example_sentence):
+    @classmethod
+    def evaluate_quality_reference(cls, example_sentence: CandidateExampleSentence, word: Optional[str] = None,
+                                   log=False) -> QualityEvaluationResult:
+        return cls._evaluate_quality(example_sentence, word, log, compiled=False)
+
+    @classmethod
+    def evaluate_quality_many(cls, example_sentences: List[CandidateExampleSentence],
+                              words: Optional[List[Optional[str]]] = None, log=False) \
+            -> List[QualityEvaluationResult]:
+        """
+        evaluate_quality for many sentences (and optionally the word to check for in each)
+        the sentences that get as far as needing their lexical content get it from mecab all at once
+        """
+        if words is None:
+            words = [None] * len(example_sentences)
+        compute_lexical_words_many([example_sentence for example_sentence, word in zip(example_sentences, words)
+                                    if (word is not None or cls._has_translation(example_sentence))
+                                    and cls.passes_pre_translation_filters(example_sentence)])
+        return [cls.evaluate_quality(example_sentence, word=word, log=log)
+                for example_sentence, word in zip(example_sentences, words)]
+
+    @staticmethod
+    def _has_translation(example_sentence: CandidateExampleSentence) -> bool:
+        # meant to cover translation being empty, but also might be "-" or something like that
+        return example_sentence.translation is not None and len(example_sentence.translation) > 5
+
+    @classmethod
+    def _evaluate_quality(cls, example_sentence: CandidateExampleSentence, word: Optional[str], log: bool,
+                          compiled: bool) -> QualityEvaluationResult:
+        if compiled:
+            filter_args = [example_sentence, _text_profile(example_sentence.sentence)]
+            pre_translation_filters = cls._compiled_pre_translation_filters
+            post_translation_filters = cls._compiled_post_translation_filters
+            extra_quality_filters = cls._compiled_extra_quality_filters
+        else:
+            filter_args = [example_sentence]
+            pre_translation_filters = cls._pre_translation_filters
+            post_translation_filters = cls._post_translation_filters
+            extra_quality_filters = cls._extra_quality_filters
+
+        for filter_name, filter_fun in pre_translation_filters.items():
+            if not filter_fun(*filter_args):
                 if log:
                     discarded_sentences_logger.info(f'{filter_name} :: {example_sentence.sentence}')
                 return QualityEvaluationResult.UNSUITABLE
@@ -128,16 +269,17 @@ class ExampleSentenceQualityEvaluator:
             discarded_sentences_logger.info(f'Requested word must be in lexical content :: {example_sentence.sentence}')
             return QualityEvaluationResult.UNSUITABLE
 
-        # meant to cover translation being empty, but also might be "-" or something like that
-        has_translation = example_sentence.translation is not None and len(example_sentence.translation) > 5
-        if not has_translation:
+        if not cls._has_translation(example_sentence):
             if log:
                 discarded_sentences_logger.info(
                     f'Translation must be present :: {example_sentence.sentence} / {example_sentence.translation}')
             return QualityEvaluationResult.UNSUITABLE
 
-        for filter_name, filter_fun in cls._post_translation_filters.items():
-            if not filter_fun(example_sentence):
+        if compiled:
+            filter_args.append(_text_profile(example_sentence.translation))
+
+        for filter_name, filter_fun in post_translation_filters.items():
+            if not filter_fun(*filter_args):
                 if log:
                     discarded_sentences_logger.info(
                         f'{filter_name} :: {example_sentence.sentence} / {example_sentence.translation}')
@@ -145,14 +287,14 @@ class ExampleSentenceQualityEvaluator:
 
         # we now know the sentence is good enough. now to see if it goes through the extra checks to be called good
 
-        for filter_name, filter_fun in cls._extra_quality_filters.items():
-            if not filter_fun(example_sentence):
+        for filter_name, filter_fun in extra_quality_filters.items():
+            if not filter_fun(*filter_args):
                 return QualityEvaluationResult.SUITABLE
 
         return QualityEvaluationResult.GOOD
 
-    @staticmethod
-    def evaluate_translation_quality(example_sentence: CandidateExampleSentence,
+    @classmethod
+    def evaluate_translation_quality(cls, example_sentence: CandidateExampleSentence,
                                      machine_translation: Optional[str] = None,
                                      translator: Optional[Translator] = None,
                                      log=False) -> QualityEvaluationResult:
@@ -165,7 +307,23 @@ class ExampleSentenceQualityEvaluator:
                     "ExampleSentenceQualityController.evaluate_translation_quality requires a machine_translation "
                     "or translator be passed")
             machine_translation = translator.eng_to_jp(example_sentence.translation)
-        if estimate_jp_sentence_distance(example_sentence.sentence, machine_translation) >= 0.25:
+        distance = estimate_jp_sentence_distance(example_sentence.sentence, machine_translation)
+        return cls._translation_quality_from_distance(example_sentence, distance, log)
+
+    @classmethod
+    def evaluate_translation_quality_many(cls, example_sentences: List[CandidateExampleSentence],
+                                          machine_translations: List[str], log=False) -> List[QualityEvaluationResult]:
+        # same as above for a batch of sentences whose translations have already been machine translated back
+        distances = estimate_jp_sentence_distance_many(
+            (example_sentence.sentence, machine_translation)
+            for example_sentence, machine_translation in zip(example_sentences, machine_translations))
+        return [cls._translation_quality_from_distance(example_sentence, distance, log)
+                for example_sentence, distance in zip(example_sentences, distances)]
+
+    @staticmethod
+    def _translation_quality_from_distance(example_sentence: CandidateExampleSentence, distance: float, log: bool) \
+            -> QualityEvaluationResult:
+        if distance >= 0.25:
             if log:
                 discarded_sentences_logger.info(
                     f'Sentence must reasonably match machine translation of translation :: '
@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Optional, Callable, Iterable, List, Dict, Iterator, Tuple
+
+from .candidate_example_sentences import compute_lexical_words_many
+from .corpus_lexical_table import CorpusLexicalTable
+from ..constants import PATH_TO_EXTERNAL_DOWNLOADS
+from ..util import batched
+
+
+class CorpusIndex:
+    """
+    on-disk inverted index lemma -> byte offsets of the sentences (in an aspm's files) whose lexical content
+    contains that lemma. Lets the SentenceProducer seek straight to candidate sentences instead of scanning the
+    whole corpus.
+
+    building it means running mecab over every sentence in the corpus, so it is meant to be done once, offline
+    (see SentenceProducer.build_corpus_indices) - preferably from the aspm's CorpusLexicalTable, which has already
+    done that work. the index remembers the size/mtime of the files it was built from, and considers itself stale
+    (= not built) if these change
+
+    offsets are stored as blobs of int64 - one row per lemma per flushed chunk, concatenated on lookup
+    alongside them, the document frequency of every lemma (amt of sentences containing it), so searches can be
+    planned w/o reading any postings
+
+    a rebuild waits for the lookups in progress to close their connections before swapping in the new file
+    (windows won't replace a file that is open)
+    """
+
+    _flush_every = 5_000_000  # amt of offsets held in memory before writing them out during build
+    _tokenization_batch_size = 10000  # sentences sent to mecab at once during build
+    # sqlite limits the amount of bound parameters in a query (999 in older versions)
+    _max_query_parameters = 900
+
+    def __init__(self, aspm):
+        self._aspm = aspm
+        self.filepath = os.path.join(PATH_TO_EXTERNAL_DOWNLOADS, f"{aspm.__class__.__name__}.index.sqlite")
+        self._connections_changed = threading.Condition()
+        self._amt_connections = 0
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with self._connections_changed:
+            connection = sqlite3.connect(self.filepath)
+            self._amt_connections += 1
+        try:
+            yield connection
+        finally:
+            with self._connections_changed:
+                connection.close()
+                self._amt_connections -= 1
+                self._connections_changed.notify_all()
+
+    def _source_signature(self) -> Optional[str]:
+        filepaths = self._aspm.get_source_filepaths(prompt_user=False)
+        if filepaths is None:
+            return None
+        return json.dumps([(os.path.getsize(filepath), os.path.getmtime(filepath)) for filepath in filepaths])
+
+    def is_built(self) -> bool:
+        if not os.path.exists(self.filepath):
+            return False
+        signature = self._source_signature()
+        if signature is None:
+            return False
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'source_signature'").fetchone()
+        return row is not None and row[0] == signature
+
+    def build(self, progress_callback: Optional[Callable[[int], None]] = None,
+              lexical_table: Optional[CorpusLexicalTable] = None):
+        signature = self._source_signature()
+        if signature is None:
+            raise Exception(f"Attempted to build corpus index for {self._aspm.__class__.__name__}, "
+                            f"but its files are not downloaded")
+
+        # build to a temp file and swap at the end so an interrupted build never looks like a finished one
+        temp_filepath = self.filepath + ".partial"
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+
+        connection = sqlite3.connect(temp_filepath)
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute("CREATE TABLE postings (lemma TEXT NOT NULL, offsets BLOB NOT NULL)")
+
+        pending: Dict[str, array] = {}
+        frequencies: Dict[str, int] = {}
+
+        def flush():
+            connection.executemany("INSERT INTO postings (lemma, offsets) VALUES (?, ?)",
+                                   ((lemma, offsets.tobytes()) for lemma, offsets in pending.items()))
+            connection.commit()
+            pending.clear()
+
+        if lexical_table is not None:
+            with lexical_table.open() as lexical_table_reader:
+                self._build_postings(lexical_table_reader.yield_rows(), pending, frequencies, flush,
+                                     progress_callback)
+        else:
+            self._build_postings(self._yield_lexical_words(), pending, frequencies, flush, progress_callback)
+
+        connection.execute("CREATE INDEX idx_postings_lemma ON postings (lemma)")
+        self._create_frequency_table(connection)
+        connection.executemany("INSERT INTO lemma_frequencies (lemma, n_sentences) VALUES (?, ?)",
+                               frequencies.items())
+        connection.execute("INSERT INTO meta (key, value) VALUES ('source_signature', ?)", (signature,))
+        connection.commit()
+        connection.close()
+        with self._connections_changed:
+            self._connections_changed.wait_for(lambda: self._amt_connections == 0)
+            os.replace(temp_filepath, self.filepath)
+
+    def _yield_lexical_words(self) -> Iterator[Tuple[int, List[str]]]:
+        for batch in batched(self._aspm.yield_sentences_with_offsets(), self._tokenization_batch_size):
+            compute_lexical_words_many([sentence for _, sentence in batch])
+            for offset, sentence in batch:
+                yield offset, sentence.lexical_words
+
+    def _build_postings(self, lexical_words_by_offset: Iterable[Tuple[int, List[str]]], pending: Dict[str, array],
+                        frequencies: Dict[str, int], flush: Callable[[], None],
+                        progress_callback: Optional[Callable[[int], None]]):
+        amt_pending = 0
+        for idx, (offset, lexical_words) in enumerate(lexical_words_by_offset):
+            for lemma in set(lexical_words):
+                pending.setdefault(lemma, array('q')).append(offset)
+                frequencies[lemma] = frequencies.get(lemma, 0) + 1
+                amt_pending += 1
+            if amt_pending >= self._flush_every:
+                flush()
+                amt_pending = 0
+            if progress_callback is not None and idx % 10000 == 0:
+                progress_callback(idx)
+        flush()
+
+    def lookup(self, lemmas: Iterable[str]) -> Dict[str, array]:
+        found = {lemma: array('q') for lemma in lemmas}
+        with self._connect() as connection:
+            for lemma_batch in batched(found, self._max_query_parameters):
+                rows = connection.execute(f"SELECT lemma, offsets FROM postings WHERE lemma IN "
+                                          f"({','.join('?' * len(lemma_batch))})", lemma_batch)
+                for lemma, blob in rows:
+                    found[lemma].frombytes(blob)
+        return found
+
+    @staticmethod
+    def _create_frequency_table(connection: sqlite3.Connection):
+        connection.execute("CREATE TABLE lemma_frequencies (lemma TEXT PRIMARY KEY, n_sentences INTEGER NOT NULL) "
+                           "WITHOUT ROWID")
+
+    def lemma_frequencies(self, lemmas: Iterable[str]) -> Dict[str, int]:
+        # amt of sentences containing each lemma (0 for lemmas not in the corpus)
+        frequencies = {lemma: 0 for lemma in lemmas}
+        with self._connect() as connection:
+            has_table = connection.execute("SELECT 1 FROM sqlite_master "
+                                           "WHERE type = 'table' AND name = 'lemma_frequencies'").fetchone()
+            if not has_table:
+                # index built before frequencies were stored - every sentence is in a lemma's postings once
+                self._create_frequency_table(connection)
+                connection.execute("INSERT INTO lemma_frequencies (lemma, n_sentences) "
+                                   "SELECT lemma, SUM(LENGTH(offsets)) / 8 FROM postings GROUP BY lemma")
+                connection.commit()
+            for lemma_batch in batched(list(frequencies), self._max_query_parameters):
+                frequencies.update(connection.execute(f"SELECT lemma, n_sentences FROM lemma_frequencies "
+                                                      f"WHERE lemma IN ({','.join('?' * len(lemma_batch))})",
+                                                      lemma_batch))
+        return frequencies
+
+    def candidate_offsets(self, lemmas: Iterable[str]) -> List[int]:
+        # sorted so the aspm reads through its file(s) front to back
+        return sorted(set().union(*self.lookup(lemmas).values()))
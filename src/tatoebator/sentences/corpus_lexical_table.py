@@ -0,0 +1,221 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Optional, Callable, List, Dict, Iterator, Tuple
+
+from .candidate_example_sentences import ExampleSentenceQualityEvaluator
+from ..constants import PATH_TO_EXTERNAL_DOWNLOADS
+from ..language_processing import lexical_content_many
+from ..util import batched
+
+
+class CorpusLexicalTable:
+    """
+    precomputed, columnar lexical data for every sentence of an aspm, so that searches don't have to run mecab over
+    raw text. one row per sentence (in the order the aspm yields them), with columns
+        offset          : int64, as in aspm.yield_sentences_with_offsets
+        passes_filters  : int8, whether the sentence passes the quality filters that don't need a translation
+        lemmas          : int32 ids into a vocabulary, in CSR layout (lemma_starts: int64, one more than the rows)
+    rows that don't pass the filters are never tokenized and so have no lemmas
+
+    file layout: int64 header length, json header, then (8-aligned) offsets, lemma_starts, lemma_ids, passes_filters
+    and finally the vocabulary as utf-8, one lemma per line. read through mmap.
+
+    like CorpusIndex, this remembers the size/mtime of the files it was built from. it also depends on the quality
+    filters, so bump _version when they change
+
+    open() gives each caller its own LexicalTableReader, so a search and a background index build can read at the
+    same time. a rebuild waits for all readers to be closed before swapping in the new file (windows won't replace
+    a file that is open)
+    """
+
+    _version = 1
+    _tokenization_batch_size = 10000  # sentences sent to mecab at once during build
+    _copy_chunk_size = 2 ** 20  # bytes, when joining the columns into the final file
+
+    def __init__(self, aspm):
+        self._aspm = aspm
+        self.filepath = os.path.join(PATH_TO_EXTERNAL_DOWNLOADS, f"{aspm.__class__.__name__}.lexical")
+        self._readers_changed = threading.Condition()
+        self._amt_readers = 0
+
+    def _source_signature(self) -> Optional[List]:
+        filepaths = self._aspm.get_source_filepaths(prompt_user=False)
+        if filepaths is None:
+            return None
+        return [(os.path.getsize(filepath), os.path.getmtime(filepath)) for filepath in filepaths]
+
+    def _read_header(self) -> Optional[Dict]:
+        # (under the lock so it can't get in the way of a swap either)
+        with self._readers_changed:
+            if not os.path.exists(self.filepath):
+                return None
+            with open(self.filepath, 'rb') as f:
+                header_len, = struct.unpack('q', f.read(8))
+                return json.loads(f.read(header_len).decode('utf-8'))
+
+    def is_built(self) -> bool:
+        header = self._read_header()
+        signature = self._source_signature()
+        # (json turns the tuples into lists)
+        return header is not None and signature is not None and header['version'] == self._version \
+            and header['signature'] == json.loads(json.dumps(signature))
+
+    def build(self, progress_callback: Optional[Callable[[int], None]] = None):
+        signature = self._source_signature()
+        if signature is None:
+            raise Exception(f"Attempted to build lexical table for {self._aspm.__class__.__name__}, "
+                            f"but its files are not downloaded")
+
+        # the columns go to their own temp files one batch at a time (for the big corpora they'd be GBs in memory)
+        # and get joined behind the header at the end
+        temp_filepath = self.filepath + ".partial"
+        column_filepaths = [f"{temp_filepath}.{name}" for name in ['offsets', 'lemma_starts', 'lemma_ids',
+                                                                    'passes_filters']]
+        n_sentences, n_lemma_ids = 0, 0
+        lemma_ids_by_lemma: Dict[str, int] = {}
+        try:
+            with open(column_filepaths[0], 'wb') as offsets_file, \
+                    open(column_filepaths[1], 'wb') as lemma_starts_file, \
+                    open(column_filepaths[2], 'wb') as lemma_ids_file, \
+                    open(column_filepaths[3], 'wb') as passes_filters_file:
+                array('q', [0]).tofile(lemma_starts_file)
+                for batch in batched(self._aspm.yield_sentences_with_offsets(), self._tokenization_batch_size):
+                    verdicts = ExampleSentenceQualityEvaluator.passes_pre_translation_filters_many(
+                        [sentence for _, sentence in batch])
+                    # every sentence of the corpus goes through here once - no point filling the lexical content cache
+                    lexical_words_by_sentence = iter(lexical_content_many([sentence.sentence for (_, sentence), verdict
+                                                                           in zip(batch, verdicts) if verdict],
+                                                                          use_cache=False))
+                    offsets, lemma_starts, lemma_ids, passes_filters = array('q'), array('q'), array('i'), array('b')
+                    for (offset, _), verdict in zip(batch, verdicts):
+                        offsets.append(offset)
+                        passes_filters.append(verdict)
+                        if verdict:
+                            for lemma in next(lexical_words_by_sentence):
+                                lemma_ids.append(lemma_ids_by_lemma.setdefault(lemma, len(lemma_ids_by_lemma)))
+                        lemma_starts.append(n_lemma_ids + len(lemma_ids))
+                    offsets.tofile(offsets_file)
+                    lemma_starts.tofile(lemma_starts_file)
+                    lemma_ids.tofile(lemma_ids_file)
+                    passes_filters.tofile(passes_filters_file)
+                    n_sentences += len(offsets)
+                    n_lemma_ids += len(lemma_ids)
+                    if progress_callback is not None:
+                        progress_callback(n_sentences)
+
+            vocabulary = "\n".join(lemma_ids_by_lemma).encode('utf-8')
+            header = json.dumps({'version': self._version,
+                                 'signature': signature,
+                                 'n_sentences': n_sentences,
+                                 'n_lemma_ids': n_lemma_ids,
+                                 'vocabulary_bytes': len(vocabulary)}).encode('utf-8')
+            # pad so the columns are aligned
+            header += b" " * (-(8 + len(header)) % 8)
+
+            # write to a temp file and swap at the end so an interrupted build never looks like a finished one
+            with open(temp_filepath, 'wb') as f:
+                f.write(struct.pack('q', len(header)))
+                f.write(header)
+                for column_filepath in column_filepaths:
+                    with open(column_filepath, 'rb') as column_file:
+                        shutil.copyfileobj(column_file, f, self._copy_chunk_size)
+                f.write(vocabulary)
+        finally:
+            for column_filepath in column_filepaths:
+                if os.path.exists(column_filepath): os.remove(column_filepath)
+        with self._readers_changed:
+            self._readers_changed.wait_for(lambda: self._amt_readers == 0)
+            os.replace(temp_filepath, self.filepath)
+
+    def open(self) -> "LexicalTableReader":
+        with self._readers_changed:
+            reader = LexicalTableReader(self.filepath, self._on_reader_closed)
+            self._amt_readers += 1
+        return reader
+
+    def _on_reader_closed(self):
+        with self._readers_changed:
+            self._amt_readers -= 1
+            self._readers_changed.notify_all()
+
+
+class LexicalTableReader:
+    """
+    an open CorpusLexicalTable file. not to be shared between threads
+    """
+
+    def __init__(self, filepath: str, on_close: Callable[[], None]):
+        self._on_close = on_close
+        self._columns: Dict[str, memoryview] = {}
+        self._file = open(filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_len, = struct.unpack_from('q', self._mmap, 0)
+        header = json.loads(self._mmap[8:8 + header_len].decode('utf-8'))
+        n_sentences, n_lemma_ids = header['n_sentences'], header['n_lemma_ids']
+
+        view = memoryview(self._mmap)
+        start = 8 + header_len
+        for name, typecode, length in [('offsets', 'q', n_sentences),
+                                       ('lemma_starts', 'q', n_sentences + 1),
+                                       ('lemma_ids', 'i', n_lemma_ids),
+                                       ('passes_filters', 'b', n_sentences)]:
+            end = start + length * array(typecode).itemsize
+            self._columns[name] = view[start:end].cast(typecode)
+            start = end
+        vocabulary = self._mmap[start:start + header['vocabulary_bytes']].decode('utf-8')
+        self._vocabulary = vocabulary.split("\n") if vocabulary else []
+        self._lemma_ids = {lemma: lemma_id for lemma_id, lemma in enumerate(self._vocabulary)}
+        view.release()
+
+    def close(self):
+        if self._file is None: return
+        # the views have to go before the mmap can be closed
+        for column in self._columns.values(): column.release()
+        self._columns = {}
+        self._mmap.close()
+        self._file.close()
+        self._mmap = self._file = None
+        self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._columns['offsets'])
+
+    def lemma_id(self, lemma: str) -> Optional[int]:
+        return self._lemma_ids.get(lemma)
+
+    def row_for_offset(self, offset: int) -> Optional[int]:
+        offsets = self._columns['offsets']
+        row = bisect_left(offsets, offset)
+        return row if row < len(offsets) and offsets[row] == offset else None
+
+    def offset(self, row: int) -> int:
+        return self._columns['offsets'][row]
+
+    def passes_filters(self, row: int) -> bool:
+        return bool(self._columns['passes_filters'][row])
+
+    def lemma_ids(self, row: int) -> memoryview:
+        lemma_starts = self._columns['lemma_starts']
+        return self._columns['lemma_ids'][lemma_starts[row]:lemma_starts[row + 1]]
+
+    def lexical_words(self, row: int) -> List[str]:
+        return [self._vocabulary[lemma_id] for lemma_id in self.lemma_ids(row)]
+
+    def yield_rows(self) -> Iterator[Tuple[int, List[str]]]:
+        # offset, lexical words - for every row that passes the filters
+        offsets, passes_filters = self._columns['offsets'], self._columns['passes_filters']
+        for row in range(len(offsets)):
+            if passes_filters[row]:
+                yield offsets[row], self.lexical_words(row)
@@ -0,0 +1,175 @@
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Tuple, Optional
+
+
+class LineOffsetTable:
+    """
+    persisted array of int64 byte offsets, one per sentence of an aspm, kept next to the file it points into
+    lets aspms jump to the nth sentence of a corpus without reading through everything before it
+
+    the file holds the size of the indexed file at build time followed by the offsets themselves, so the table
+    can tell when it has gone stale. it is read through mmap - the larger tables are a couple hundred MB
+    """
+
+    _item_size = array('q').itemsize
+    _chunk_size = 65536  # offsets read at once when iterating
+
+    def __init__(self, source_filepath: str):
+        self.source_filepath = source_filepath
+        self.filepath = source_filepath + ".offsets"
+        self._file = None
+        self._mmap = None
+        self._len = 0
+
+    def is_up_to_date(self) -> bool:
+        if not os.path.exists(self.filepath):
+            return False
+        with open(self.filepath, 'rb') as f:
+            header = f.read(self._item_size)
+        return len(header) == self._item_size \
+            and struct.unpack('q', header)[0] == os.path.getsize(self.source_filepath)
+
+    def build(self, offsets: Iterable[int]):
+        temp_filepath = self.filepath + ".partial"
+        with open(temp_filepath, 'wb') as f:
+            chunk = array('q', [os.path.getsize(self.source_filepath)])
+            for offset in offsets:
+                chunk.append(offset)
+                if len(chunk) >= self._chunk_size:
+                    chunk.tofile(f)
+                    chunk = array('q')
+            chunk.tofile(f)
+        os.replace(temp_filepath, self.filepath)
+
+    def open(self):
+        self._file = open(self.filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._len = len(self._mmap) // self._item_size - 1
+        return self
+
+    def close(self):
+        if self._mmap is not None: self._mmap.close()
+        if self._file is not None: self._file.close()
+        self._mmap = self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, idx: int) -> int:
+        if not 0 <= idx < self._len:
+            raise IndexError(f"LineOffsetTable index out of range: {idx}")
+        return struct.unpack_from('q', self._mmap, self._item_size * (idx + 1))[0]
+
+    def iter_from(self, start_at: int = 0) -> Iterator[int]:
+        for chunk_start in range(start_at, self._len, self._chunk_size):
+            chunk_end = min(chunk_start + self._chunk_size, self._len)
+            chunk = array('q')
+            chunk.frombytes(self._mmap[self._item_size * (chunk_start + 1):self._item_size * (chunk_end + 1)])
+            yield from chunk
+
+
+class IdOffsetTable:
+    """
+    persisted map from integer ids to the byte offset of the line w that id, for files with one record per line
+    (like the tatoeba sentence exports). lets us look up a record by id w/o keeping the file in memory
+
+    file layout: size of the indexed file at build time, amt of entries, then ids (sorted) and offsets, all int64
+    lookups are a binary search over the mmapped ids
+    """
+
+    _item_size = array('q').itemsize
+
+    def __init__(self, source_filepath: str):
+        self.source_filepath = source_filepath
+        self.filepath = source_filepath + ".idoffsets"
+        self._file = None
+        self._mmap = None
+        self._ids = None
+        self._offsets = None
+
+    def is_up_to_date(self) -> bool:
+        if not os.path.exists(self.filepath):
+            return False
+        with open(self.filepath, 'rb') as f:
+            header = f.read(self._item_size)
+        return len(header) == self._item_size \
+            and struct.unpack('q', header)[0] == os.path.getsize(self.source_filepath)
+
+    def build(self, ids_and_offsets: Iterable[Tuple[int, int]]):
+        ids, offsets = array('q'), array('q')
+        for id_, offset in ids_and_offsets:
+            ids.append(id_)
+            offsets.append(offset)
+        # usually already sorted, but don't count on it
+        if any(ids[i] > ids[i + 1] for i in range(len(ids) - 1)):
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            ids = array('q', (ids[i] for i in order))
+            offsets = array('q', (offsets[i] for i in order))
+        temp_filepath = self.filepath + ".partial"
+        with open(temp_filepath, 'wb') as f:
+            array('q', [os.path.getsize(self.source_filepath), len(ids)]).tofile(f)
+            ids.tofile(f)
+            offsets.tofile(f)
+        os.replace(temp_filepath, self.filepath)
+
+    def open(self):
+        self._file = open(self.filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        n, = struct.unpack_from('q', self._mmap, self._item_size)
+        view = memoryview(self._mmap)
+        start = 2 * self._item_size
+        self._ids = view[start:start + n * self._item_size].cast('q')
+        self._offsets = view[start + n * self._item_size:start + 2 * n * self._item_size].cast('q')
+        view.release()
+        return self
+
+    def close(self):
+        # the views have to go before the mmap can be closed
+        if self._ids is not None: self._ids.release()
+        if self._offsets is not None: self._offsets.release()
+        if self._mmap is not None: self._mmap.close()
+        if self._file is not None: self._file.close()
+        self._ids = self._offsets = self._mmap = self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, id_: int) -> bool:
+        return self.get(id_) is not None
+
+    def get(self, id_: int) -> Optional[int]:
+        idx = bisect_left(self._ids, id_)
+        if idx < len(self._ids) and self._ids[idx] == id_:
+            return self._offsets[idx]
+        return None
+
+
+def yield_line_offsets(filepath: str) -> Iterator[int]:
+    # offset of every line in a file. binary iteration, no decoding - this is the fast path for building tables
+    with open(filepath, 'rb') as f:
+        offset = 0
+        for line in f:
+            yield offset
+            offset += len(line)
+
+
+def open_mmap(filepath: str) -> mmap.mmap:
+    with open(filepath, 'rb') as f:
+        # mmap keeps its own handle to the file
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
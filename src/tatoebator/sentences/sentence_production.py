@@ -1,27 +1,33 @@
-import csv
-import csv
 import itertools
 import os
 import re
-import time
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 from dataclasses import dataclass, fields
 from difflib import SequenceMatcher
 from enum import Enum
 from functools import lru_cache
 from math import ceil
-from typing import Optional, Iterator, List, Dict, Callable, Tuple
+from typing import Optional, Iterator, List, Dict, Callable, Tuple, Iterable, Set, Coroutine
 
 import requests
 from titlecase import titlecase
 
 from .candidate_example_sentences import ExampleSentenceQualityEvaluator, QualityEvaluationResult
+from .corpus_index import CorpusIndex
+from .corpus_lexical_table import CorpusLexicalTable
+from .line_offsets import LineOffsetTable, IdOffsetTable, yield_line_offsets, open_mmap
+from .sharded_search import yield_sharded_candidates, sharded_search_available
 from .example_sentences import CandidateExampleSentence, ExampleSentence
 from ..constants import PATH_TO_SOURCES_FILE, USER_AGENT, \
     PATH_TO_EXTERNAL_DOWNLOADS
 from ..external_download_requester import ExternalDownloadRequester
 from ..language_processing import approximate_jp_root_form, Translator
 from ..robots import RobotsAwareSession
-from ..util import AutoRemovingThread, RankedBuffer
+from ..util import RankedBuffer, AhoCorasickMatcher, batched
 
 
 def _get_source_tag(source_name: str, license: str):
@@ -70,10 +76,113 @@ class ArbitrarySentenceProductionMethod(TaggedSource):
     last_seen_index = 0
     translations_reliable = False
     amt_sentences = None
+    downloadable_name: Optional[str] = None  # name of the ExternalDownloadRequester downloadable w the files, if any
 
     def yield_sentences(self, start_at: int = 0) -> Iterator[CandidateExampleSentence]:
         raise NotImplementedError()
 
+    def yield_sentences_with_offsets(self) -> Iterator[Tuple[int, CandidateExampleSentence]]:
+        # offsets are byte offsets into whichever file the aspm reads its sentences from - they only have to mean
+        # something to yield_sentences_at. used to build the corpus index
+        raise NotImplementedError()
+
+    def yield_sentences_at(self, offsets: Iterable[int]) -> Iterator[CandidateExampleSentence]:
+        raise NotImplementedError()
+
+    def get_sentence(self, idx: int) -> CandidateExampleSentence:
+        # random access by sentence index - get_sentence(i) is what yield_sentences(start_at=i) would yield first
+        raise NotImplementedError()
+
+    def get_source_filepaths(self, prompt_user: bool = True) -> Optional[List[str]]:
+        # None if the download was refused. anything derived from these files (e.g. the index) goes stale w them
+        raise NotImplementedError()
+
+
+class SingleFileASPM(ArbitrarySentenceProductionMethod):
+    """
+    aspm reading from a single downloaded file containing one sentence pair per line
+    subclasses only need to say which downloadable they read from and how to parse a line
+    """
+
+    def __init__(self, external_download_requester: ExternalDownloadRequester):
+        super().__init__()
+        self._external_download_requester = external_download_requester
+
+    def get_source_filepaths(self, prompt_user: bool = True) -> Optional[List[str]]:
+        filepaths = self._external_download_requester.get_external_downloadable(self.downloadable_name,
+                                                                                prompt_user=prompt_user)
+        if filepaths is None:
+            return None
+        else:
+            return [filepaths['filepath']]
+
+    @property
+    def _filepath(self):
+        filepaths = self.get_source_filepaths()
+        return filepaths and filepaths[0]
+
+    @classmethod
+    def parse_line(cls, line: str) -> CandidateExampleSentence:
+        # classmethod so that search worker processes can parse lines without instantiating the aspm
+        raise NotImplementedError()
+
+    @staticmethod
+    def decode_line(line: bytes) -> str:
+        # files are read in binary to be able to keep track of offsets, so we normalize newlines ourselves
+        return line.decode('utf-8').rstrip('\r\n') + '\n'
+
+    @staticmethod
+    def _get_line_offsets(filepath: str) -> LineOffsetTable:
+        line_offsets = LineOffsetTable(filepath)
+        if not line_offsets.is_up_to_date():
+            line_offsets.build(yield_line_offsets(filepath))
+        return line_offsets
+
+    def _yield_lines(self, filepath: str, start_at: int = 0) -> Iterator[Tuple[int, str]]:
+        with self._get_line_offsets(filepath) as line_offsets:
+            if start_at >= len(line_offsets): return
+            offset = line_offsets[start_at]
+        with open_mmap(filepath) as mm:
+            mm.seek(offset)
+            for line in iter(mm.readline, b''):
+                yield offset, self.decode_line(line)
+                offset += len(line)
+
+    def yield_sentences(self, start_at: int = 0) -> Iterator[CandidateExampleSentence]:
+        filepath = self._filepath
+        if filepath is None:
+            print(f"[Tatoebator] {self.__class__.__name__} aborting because download was refused by user")
+            return
+        self.last_seen_index = start_at
+        for _, line in self._yield_lines(filepath, start_at=start_at):
+            yield self.parse_line(line)
+            self.last_seen_index += 1
+
+    def yield_sentences_with_offsets(self) -> Iterator[Tuple[int, CandidateExampleSentence]]:
+        filepath = self._filepath
+        if filepath is None: return
+        for offset, line in self._yield_lines(filepath):
+            yield offset, self.parse_line(line)
+
+    def yield_sentences_at(self, offsets: Iterable[int]) -> Iterator[CandidateExampleSentence]:
+        filepath = self._filepath
+        if filepath is None: return
+        with open_mmap(filepath) as mm:
+            for offset in offsets:
+                mm.seek(offset)
+                yield self.parse_line(self.decode_line(mm.readline()))
+
+    def get_sentence(self, idx: int) -> CandidateExampleSentence:
+        filepath = self._filepath
+        with self._get_line_offsets(filepath) as line_offsets:
+            offset = line_offsets[idx]
+        return next(self.yield_sentences_at([offset]))
+
+    def get_byte_shards(self, shard_size: int) -> List[Tuple[int, int]]:
+        # byte ranges covering the whole file. a line belongs to the shard in which it starts
+        size = os.path.getsize(self._filepath)
+        return [(start, min(start + shard_size, size)) for start in range(0, size, shard_size)]
+
 
 class TatoebaSPM(SentenceProductionMethod):
     source_name = 'Tatoeba (via API)'
@@ -206,40 +315,23 @@ class SentenceSearchNeocitiesASPM(ArbitrarySentenceProductionMethod):
                     self.last_seen_index = line_number // 6
 
 
-class ManyThingsTatoebaASPM(ArbitrarySentenceProductionMethod):
+class ManyThingsTatoebaASPM(SingleFileASPM):
     source_name = "ManyThings.org Sentence Pairs"
     license = "CC-BY 2.0 Fr"
     translations_reliable = True
     amt_sentences = 109964
 
-    def __init__(self, external_download_requester: ExternalDownloadRequester):
-        super().__init__()
-        self._external_download_requester = external_download_requester
+    downloadable_name = 'ManyThingsTatoeba'
 
-    @property
-    def _filepath(self):
-        filepaths = self._external_download_requester.get_external_downloadable('ManyThingsTatoeba')
-        if filepaths is None:
-            return None
-        else:
-            return filepaths['filepath']
+    _line_matcher = re.compile(r'([^\t]+)\t([^\t]+)\t([^\t]+)')
+    _license_matcher = re.compile(r'CC-BY 2\.0 \(France\) Attribution: tatoeba\.org #\d+ \((.+)\) & #\d+ \((.+)\)\n')
 
-    def yield_sentences(self, start_at: int = 0) -> Iterator[CandidateExampleSentence]:
-        filepath = self._filepath
-        if filepath is None:
-            print("[Tatoebator] ManyThingsTatoebaASPM aborting because download was refused by user")
-            return
-        line_matcher = re.compile(r'([^\t]+)\t([^\t]+)\t([^\t]+)')
-        license_matcher = re.compile(r'CC-BY 2\.0 \(France\) Attribution: tatoeba\.org #\d+ \((.+)\) & #\d+ \((.+)\)\n')
-        with open(filepath, 'r', encoding='utf-8') as file:
-            for _ in range(start_at): next(file)
-            self.last_seen_index = start_at
-            for line in file:
-                line_match = line_matcher.match(line)
-                eng_text, jap_text, license = line_match.groups()
-                en_owner, jp_owner = license_matcher.match(license).groups()
-                yield CandidateExampleSentence(jap_text, eng_text, credit=f"{jp_owner}, {en_owner} (Tatoeba)")
-                self.last_seen_index += 1
+    @classmethod
+    def parse_line(cls, line: str) -> CandidateExampleSentence:
+        line_match = cls._line_matcher.match(line)
+        eng_text, jap_text, license = line_match.groups()
+        en_owner, jp_owner = cls._license_matcher.match(license).groups()
+        return CandidateExampleSentence(jap_text, eng_text, credit=f"{jp_owner}, {en_owner} (Tatoeba)")
 
 
 class TatoebaASPM(ArbitrarySentenceProductionMethod):
@@ -247,123 +339,155 @@ class TatoebaASPM(ArbitrarySentenceProductionMethod):
     license = "CC-BY 2.0 Fr"
     translations_reliable = True
     amt_sentences = 275845
+    downloadable_name = 'Tatoeba'
 
     def __init__(self, external_download_requester: ExternalDownloadRequester):
         super().__init__()
         self._external_download_requester = external_download_requester
 
+    def _get_filepaths(self, prompt_user: bool = True):
+        return self._external_download_requester.get_external_downloadable(self.downloadable_name,
+                                                                           prompt_user=prompt_user)
+
     @property
     def _filepaths(self):
-        return self._external_download_requester.get_external_downloadable('Tatoeba')
+        return self._get_filepaths()
 
-    def _read_lan_file(self, language_tag: str):
-        if language_tag not in ['jpn', 'eng']: raise Exception("Incorrect language tag in TatoebaASPM._read_lan_file")
-        data = {}
-        filepath = self._filepaths[language_tag]
-        with open(filepath, encoding='utf-8') as file:
-            reader = csv.reader(file, delimiter='\t')
-            for idx, text, owner in reader:
-                data[idx] = (text, owner if owner != "\\N" else "unknown")
-        return data
-
-    def _create_dataframe(self, start_at: int = 0):
-        # this used to be written in pandas and yet somehow it was slower
-        en_data = self._read_lan_file('eng')
-        jp_data = self._read_lan_file('jpn')
+    def get_source_filepaths(self, prompt_user: bool = True) -> Optional[List[str]]:
+        filepaths = self._get_filepaths(prompt_user=prompt_user)
+        if filepaths is None:
+            return None
+        else:
+            return [filepaths['pairs'], filepaths['eng'], filepaths['jpn']]
 
-        merged_data = []
+    def _get_id_offsets(self, language_tag: str) -> IdOffsetTable:
+        # the language files are only ever read a line at a time through these, never loaded whole
+        if language_tag not in ['jpn', 'eng']: raise Exception("Incorrect language tag in TatoebaASPM._get_id_offsets")
+        filepath = self._filepaths[language_tag]
+        id_offsets = IdOffsetTable(filepath)
+        if not id_offsets.is_up_to_date():
+            id_offsets.build(self._yield_ids_with_offsets(filepath))
+        return id_offsets
+
+    @staticmethod
+    def _yield_ids_with_offsets(filepath: str) -> Iterator[Tuple[int, int]]:
+        with open(filepath, 'rb') as f:
+            offset = 0
+            for line in f:
+                yield int(line[:line.index(b'\t')]), offset
+                offset += len(line)
+
+    @staticmethod
+    def _read_lan_line(mm, offset: int) -> Tuple[str, str]:
+        # text, owner
+        mm.seek(offset)
+        _, text, owner = mm.readline().decode('utf-8').rstrip('\r\n').split('\t')
+        return text, owner if owner != "\\N" else "unknown"
+
+    @contextmanager
+    def _open_id_offsets(self) -> Iterator[Tuple[IdOffsetTable, IdOffsetTable]]:
+        with self._get_id_offsets('eng') as en_offsets, self._get_id_offsets('jpn') as jp_offsets:
+            yield en_offsets, jp_offsets
+
+    def _yield_pairs(self) -> Iterator[Tuple[int, int, int]]:
+        # offset in pairs file, en_idx, jp_idx. only the first pair for each japanese sentence
         seen_jp_idx = set()  # To drop duplicates
-        with open(self._filepaths['pairs'], encoding='utf-8') as f:
-            for _ in range(start_at): next(f)
-            reader = csv.reader(f, delimiter='\t')
-            for en_idx, jp_idx in reader:
+        with open(self._filepaths['pairs'], 'rb') as f:
+            offset = 0
+            for line in f:
+                en_idx, jp_idx = map(int, line.split(b'\t'))
+                line_offset = offset
+                offset += len(line)
                 if jp_idx in seen_jp_idx: continue
                 seen_jp_idx.add(jp_idx)
-                if jp_idx not in jp_data or en_idx not in en_data: continue
-                jp_text, jp_owner = jp_data[jp_idx]
-                en_text, en_owner = en_data[en_idx]
-                merged_data.append((jp_text, jp_owner, en_text, en_owner))
-
-        return merged_data
+                yield line_offset, en_idx, jp_idx
+
+    def _get_line_offsets(self, en_offsets: IdOffsetTable, jp_offsets: IdOffsetTable) -> LineOffsetTable:
+        # offsets of the pairs that actually make it to be sentences - so the table is indexed by sentence
+        line_offsets = LineOffsetTable(self._filepaths['pairs'])
+        if not line_offsets.is_up_to_date():
+            line_offsets.build(offset for offset, en_idx, jp_idx in self._yield_pairs()
+                               if jp_idx in jp_offsets and en_idx in en_offsets)
+        return line_offsets
+
+    def _yield_sentences_at(self, offsets: Iterable[int], en_offsets: IdOffsetTable, jp_offsets: IdOffsetTable) \
+            -> Iterator[CandidateExampleSentence]:
+        with open_mmap(self._filepaths['pairs']) as mm, \
+                open_mmap(self._filepaths['eng']) as en_mm, \
+                open_mmap(self._filepaths['jpn']) as jp_mm:
+            for offset in offsets:
+                mm.seek(offset)
+                en_idx, jp_idx = map(int, mm.readline().split(b'\t'))
+                jp_text, jp_owner = self._read_lan_line(jp_mm, jp_offsets.get(jp_idx))
+                en_text, en_owner = self._read_lan_line(en_mm, en_offsets.get(en_idx))
+                yield CandidateExampleSentence(jp_text, en_text, credit=f"{jp_owner}, {en_owner} (Tatoeba)")
 
     def yield_sentences(self, start_at: int = 0) -> Iterator[CandidateExampleSentence]:
         if self._filepaths is None:
             print("[Tatoebator] TatoebaASPM aborting because download was refused by user")
             return
-        df = self._create_dataframe(start_at=start_at)
-        self.last_seen_index = start_at
-        for jp_text, jp_owner, en_text, en_owner in df:
-            yield CandidateExampleSentence(jp_text, en_text, credit=f"{jp_owner}, {en_owner} (Tatoeba)")
-            self.last_seen_index += 1
+        # this used to be written in pandas and yet somehow it was slower
+        # then it loaded both language files into dicts - now everything is looked up on disk, memory stays flat
+        with self._open_id_offsets() as (en_offsets, jp_offsets), \
+                self._get_line_offsets(en_offsets, jp_offsets) as line_offsets:
+            self.last_seen_index = start_at
+            for sentence in self._yield_sentences_at(line_offsets.iter_from(start_at), en_offsets, jp_offsets):
+                yield sentence
+                self.last_seen_index += 1
+
+    def yield_sentences_with_offsets(self) -> Iterator[Tuple[int, CandidateExampleSentence]]:
+        if self._filepaths is None: return
+        with self._open_id_offsets() as (en_offsets, jp_offsets), \
+                self._get_line_offsets(en_offsets, jp_offsets) as line_offsets:
+            offsets = line_offsets.iter_from(0)
+            # (the offsets are consumed twice, so each gets its own iterator)
+            offsets, offsets_for_reading = itertools.tee(offsets)
+            yield from zip(offsets, self._yield_sentences_at(offsets_for_reading, en_offsets, jp_offsets))
+
+    def yield_sentences_at(self, offsets: Iterable[int]) -> Iterator[CandidateExampleSentence]:
+        if self._filepaths is None: return
+        with self._open_id_offsets() as (en_offsets, jp_offsets):
+            yield from self._yield_sentences_at(offsets, en_offsets, jp_offsets)
 
+    def get_sentence(self, idx: int) -> CandidateExampleSentence:
+        with self._open_id_offsets() as (en_offsets, jp_offsets):
+            with self._get_line_offsets(en_offsets, jp_offsets) as line_offsets:
+                offset = line_offsets[idx]
+            return next(self._yield_sentences_at([offset], en_offsets, jp_offsets))
 
-class JapaneseEnglishSubtitleCorpusASPM(ArbitrarySentenceProductionMethod):
+
+class JapaneseEnglishSubtitleCorpusASPM(SingleFileASPM):
     source_name = "Japanese-English Subtitle Corpus"
     license = "CC BY-SA 4.0"
     translations_reliable = False
     amt_sentences = 2801388
 
-    def __init__(self, external_download_requester: ExternalDownloadRequester):
-        super().__init__()
-        self._external_download_requester = external_download_requester
+    downloadable_name = 'JapaneseEnglishSubtitleCorpus'
 
-    @property
-    def _filepath(self):
-        filepaths = self._external_download_requester.get_external_downloadable('JapaneseEnglishSubtitleCorpus')
-        if filepaths is None:
-            return None
-        else:
-            return filepaths['filepath']
+    _line_matcher = re.compile(r"([^\t]+)\t([^\t]+)\n")
 
-    def yield_sentences(self, start_at: int = 0) -> Iterator[CandidateExampleSentence]:
-        filepath = self._filepath
-        if filepath is None:
-            print("[Tatoebator] JapaneseEnglishSubtitleCorpusASPM aborting because download was refused by user")
-            return
-        line_matcher = re.compile(r"([^\t]+)\t([^\t]+)\n")
-        self.last_seen_index = start_at
-        with open(filepath, 'r', encoding='utf-8') as file:
-            for _ in range(start_at): next(file)
-            for i, line in enumerate(file):
-                en_text, jp_text = line_matcher.fullmatch(line).groups()
-                yield CandidateExampleSentence(jp_text, en_text, credit=f"Japanese-English Subtitle Corpus")
-                self.last_seen_index += 1
+    @classmethod
+    def parse_line(cls, line: str) -> CandidateExampleSentence:
+        en_text, jp_text = cls._line_matcher.fullmatch(line).groups()
+        return CandidateExampleSentence(jp_text, en_text, credit=f"Japanese-English Subtitle Corpus")
 
 
-class JParaCrawlASPM(ArbitrarySentenceProductionMethod):
+class JParaCrawlASPM(SingleFileASPM):
     source_name = "JParaCrawl"
     license = "https://www.kecl.ntt.co.jp/icl/lirg/jparacrawl/"
     translations_reliable = False
     amt_sentences = 25740835
 
-    def __init__(self, external_download_requester: ExternalDownloadRequester):
-        super().__init__()
-        self._external_download_requester = external_download_requester
+    downloadable_name = 'JParaCrawl'
 
-    @property
-    def _filepath(self):
-        filepaths = self._external_download_requester.get_external_downloadable('JParaCrawl')
-        if filepaths is None:
-            return None
-        else:
-            return filepaths['filepath']
+    _line_matcher = re.compile(r"([^\t]+)\t([^\t]+)\t([^\t]+)\t([^\t]+)\t([^\t]+)\n")
 
-    def yield_sentences(self, start_at: int = 0) -> Iterator[CandidateExampleSentence]:
-        filepath = self._filepath
-        if filepath is None:
-            print("[Tatoebator] JParaCrawlASPM aborting because download was refused by user")
-            return
-        line_matcher = re.compile(r"([^\t]+)\t([^\t]+)\t([^\t]+)\t([^\t]+)\t([^\t]+)\n")
-        self.last_seen_index = start_at
-        with open(filepath, 'r', encoding='utf-8') as file:
-            for _ in range(start_at): next(file)
-            for line in file:
-                source_1, source_2, score, en_text, jp_text = line_matcher.fullmatch(line).groups()
-                common_source = self._common_source(source_1, source_2)
-                credit = f"{common_source} (JParaCrawl)" if len(common_source) > 8 else "JParaCrawl"
-
-                yield CandidateExampleSentence(jp_text, en_text, credit=credit)
-                self.last_seen_index += 1
+    @classmethod
+    def parse_line(cls, line: str) -> CandidateExampleSentence:
+        source_1, source_2, score, en_text, jp_text = cls._line_matcher.fullmatch(line).groups()
+        common_source = cls._common_source(source_1, source_2)
+        credit = f"{common_source} (JParaCrawl)" if len(common_source) > 8 else "JParaCrawl"
+        return CandidateExampleSentence(jp_text, en_text, credit=credit)
 
     @classmethod
     @lru_cache
@@ -394,6 +518,9 @@ class SentenceSearchConfig:
     max_retranslation_attempts: int = 3
     max_oversearch_factor: float = 5
     generate_machine_translations: bool = False
+    # >1 to search the larger corpora in a process pool. each process runs its own mecab
+    # script-only: ignored inside anki, which can't start python worker processes (see sharded_search_available)
+    search_processes: int = 1
 
     def __iter__(self):
         return iter(tuple(getattr(self, field.name) for field in fields(self)))
@@ -424,20 +551,31 @@ class SentenceProducer:
         JParaCrawlASPM,
     ]
 
+    _search_shard_size = 16 * 2 ** 20  # bytes
+    _tokenization_batch_size = 500  # sentences sent to mecab at once when ingesting
+
     def __init__(self,
                  external_download_requester: ExternalDownloadRequester,
-                 search_config: Optional[SentenceSearchConfig]):
+                 search_config: Optional[SentenceSearchConfig],
+                 translator: Optional[Translator] = None):
         self._quality_control = ExampleSentenceQualityEvaluator()
         self.amt_searchable_sentences = sum([aspm.amt_sentences for aspm in self._aspms_for_searching])
         self.amt_starter_sentences = sum([aspm.amt_sentences for aspm in self._aspms_for_ingesting])
-        self._translator = Translator()  # TODO pass this on from up high
 
         self._aspms_for_searching = [ASPM(external_download_requester) for ASPM in self._aspms_for_searching]
         self._aspms_for_ingesting = [ASPM(external_download_requester) for ASPM in self._aspms_for_ingesting]
+        self._corpus_indices = {aspm: CorpusIndex(aspm) for aspm in self._aspms_for_searching}
+        self._lexical_tables = {aspm: CorpusLexicalTable(aspm) for aspm in self._aspms_for_searching}
+        self._preprocessing_lock = threading.Lock()
+        external_download_requester.add_download_listener(self._on_download)
 
         # no real reason to have a setter for this right now, but might change in the future
         self._search_config = search_config or SentenceSearchConfig()
 
+        # can be passed in, e.g. one w an offline backend to run searches w/o network
+        self._translator = translator \
+            or Translator(max_concurrent_requests=self._search_config.max_parallel_translations)
+
     def yield_starter_sentences(self, desired_amt: Optional[int] = None,
                                 filtering_fun: Callable[[CandidateExampleSentence], bool] = lambda s: True) \
             -> Iterator[ExampleSentence]:
@@ -455,17 +593,113 @@ class SentenceProducer:
 
         for aspm in self._aspms_for_ingesting:
             assert aspm.translations_reliable
-            for sentence in aspm.yield_sentences():
-                evaluation = self._quality_control.evaluate_quality(sentence)
-                if not filtering_fun(sentence): continue
-                if evaluation is QualityEvaluationResult.UNSUITABLE: continue
-                if scoring_requirements is not None and scoring_callback(sentence) < min_score: continue
-
-                yield ExampleSentence.from_candidate(sentence, aspm.source_tag,
-                                                     evaluation is QualityEvaluationResult.GOOD)
-                desired_amt -= 1
-                if desired_amt <= 0:
-                    return
+            for sentence_batch in batched(aspm.yield_sentences(), self._tokenization_batch_size):
+                sentence_batch = [sentence for sentence in sentence_batch if filtering_fun(sentence)]
+                # (only the sentences that get past the cheap filters go to mecab, all together)
+                evaluations = self._quality_control.evaluate_quality_many(sentence_batch)
+                for sentence, evaluation in zip(sentence_batch, evaluations):
+                    if evaluation is QualityEvaluationResult.UNSUITABLE: continue
+                    if scoring_requirements is not None and scoring_callback(sentence) < min_score: continue
+
+                    yield ExampleSentence.from_candidate(sentence, aspm.source_tag,
+                                                         evaluation is QualityEvaluationResult.GOOD)
+                    desired_amt -= 1
+                    if desired_amt <= 0:
+                        return
+
+    def build_corpus_indices(self, rebuild: bool = False,
+                             progress_callback: Optional[Callable[[str, int], None]] = None):
+        """
+        builds the lexical table and the lemma -> offset index for every searchable aspm whose files are downloaded
+        this runs mecab over every sentence in each corpus - expect it to take hours for the larger ones
+        :param rebuild: rebuild tables/indices even if they exist and are up to date
+        :param progress_callback: takes the name of the source being indexed and the amt of sentences indexed so far
+        """
+        for aspm in self._aspms_for_searching:
+            self._preprocess_corpus(aspm, rebuild=rebuild, progress_callback=progress_callback)
+
+    def _preprocess_corpus(self, aspm: ArbitrarySentenceProductionMethod, rebuild: bool = False,
+                           progress_callback: Optional[Callable[[str, int], None]] = None):
+        # one at a time - a build from a download notification and one from build_corpus_indices would share files
+        with self._preprocessing_lock:
+            self._preprocess_corpus_unlocked(aspm, rebuild, progress_callback)
+
+    def _preprocess_corpus_unlocked(self, aspm: ArbitrarySentenceProductionMethod, rebuild: bool,
+                                    progress_callback: Optional[Callable[[str, int], None]]):
+        if aspm.get_source_filepaths(prompt_user=False) is None: return
+        lexical_table, corpus_index = self._lexical_tables[aspm], self._corpus_indices[aspm]
+        aspm_progress_callback = None
+        if progress_callback is not None:
+            aspm_progress_callback = lambda amt, source_name=aspm.source_name: progress_callback(source_name, amt)
+        # the table is where mecab runs - the index is then built out of it
+        if rebuild or not lexical_table.is_built():
+            lexical_table.build(progress_callback=aspm_progress_callback)
+            rebuild = True
+        if rebuild or not corpus_index.is_built():
+            corpus_index.build(progress_callback=aspm_progress_callback, lexical_table=lexical_table)
+
+    def _get_lemma_frequencies(self, words: Iterable[str]) \
+            -> Dict[ArbitrarySentenceProductionMethod, Optional[Dict[str, int]]]:
+        # amt of sentences containing each word, for every searchable aspm - None for the aspms that aren't indexed
+        words = list(words)
+        return {aspm: corpus_index.lemma_frequencies(words) if corpus_index.is_built() else None
+                for aspm, corpus_index in self._corpus_indices.items()}
+
+    def count_candidate_sentences(self, words: Iterable[str]) -> Dict[str, Optional[int]]:
+        """
+        for each word, the amt of sentences in the searchable corpora that contain it - an upper bound on how many
+        new sentences a search could find. None if this can't be told, i.e. some corpus isn't downloaded or indexed
+        lets client code know a search is hopeless before running it
+        """
+        words = list(words)
+        lemma_frequencies = self._get_lemma_frequencies(words)
+        if any(frequencies is None for frequencies in lemma_frequencies.values()):
+            return {word: None for word in words}
+        return {word: sum(frequencies[word] for frequencies in lemma_frequencies.values()) for word in words}
+
+    def _on_download(self, downloadable_name: str):
+        # a corpus just got downloaded - preprocess it in the background. searches work without this, just slower
+        for aspm in self._aspms_for_searching:
+            if aspm.downloadable_name == downloadable_name:
+                threading.Thread(target=self._preprocess_corpus, args=(aspm,), daemon=True).start()
+
+    def _yield_search_candidates(self, aspm: ArbitrarySentenceProductionMethod,
+                                 get_words_by_root: Callable[[], Dict[str, str]]) \
+            -> Iterator[Tuple[float, CandidateExampleSentence, Optional[Dict[str, QualityEvaluationResult]]]]:
+        # yields the sentences of the aspm that are worth checking for any of the words, each with the amt of
+        # sentences of the aspm searched so far (for progress reports)
+        # when searching in worker processes the root check and quality evaluation have already been done, so the
+        # evaluation for every root found in the sentence is yielded too. otherwise this last item is None
+        # sentences coming from the lexical table have their lexical words filled in, so they don't go through mecab
+        lexical_table, corpus_index = self._lexical_tables[aspm], self._corpus_indices[aspm]
+        search_processes = self._search_config.search_processes
+        # the table alone is no use for finding candidates (that'd be going through every lemma of the corpus) - it
+        # only saves the mecab calls on the ones the index finds
+        if lexical_table.is_built() and corpus_index.is_built():
+            # (a reader of our own - the table might be getting read by a background index build too)
+            with lexical_table.open() as lexical_table_reader:
+                rows = map(lexical_table_reader.row_for_offset,
+                           corpus_index.candidate_offsets(get_words_by_root().values()))
+                rows = [row for row in rows if row is not None and lexical_table_reader.passes_filters(row)]
+                weight = aspm.amt_sentences / max(1, len(rows))
+                offsets = [lexical_table_reader.offset(row) for row in rows]
+                for idx, (row, sentence) in enumerate(zip(rows, aspm.yield_sentences_at(offsets))):
+                    sentence.lexical_words = lexical_table_reader.lexical_words(row)
+                    yield (idx + 1) * weight, sentence, None
+        elif corpus_index.is_built():
+            offsets = corpus_index.candidate_offsets(get_words_by_root().values())
+            weight = aspm.amt_sentences / max(1, len(offsets))
+            for idx, sentence in enumerate(aspm.yield_sentences_at(offsets)):
+                yield (idx + 1) * weight, sentence, None
+        elif search_processes > 1 and sharded_search_available() and isinstance(aspm, SingleFileASPM) \
+                and aspm.get_source_filepaths() is not None:
+            for amt_searched, candidates in yield_sharded_candidates(aspm, get_words_by_root,
+                                                                     search_processes, self._search_shard_size):
+                for sentence, evaluations in candidates:
+                    yield amt_searched, sentence, evaluations
+        else:
+            for idx, sentence in enumerate(aspm.yield_sentences()):
+                yield idx + 1, sentence, None
 
     def find_new_sentences_with_word(self, word: str, desired_amt: int,
                                      filtering_fun: Callable[[CandidateExampleSentence], bool] = lambda s: True,
@@ -533,7 +767,7 @@ class SentenceProducer:
         only returns sentences that satisfy filtering_fun (usually a callback meant to determine if
          a sentence is already in the db)
 
-        uses threading to run translation requests in parallel - max_parallel_translations specifies how many
+        runs translation requests concurrently on the translator's event loop (max_parallel_translations of them)
         batches translations to try to keep the amount of api requests down - translation_batch_size
         :param word_desired_amts: dict word -> int, how many sentences to return per each word
         :param filtering_fun: bool callable on ExampleSentence - if false sentence is discarded
@@ -554,7 +788,7 @@ class SentenceProducer:
 
         (scoring_requirements, filtering_callback, max_parallel_translations,
          translation_batch_size, max_retranslation_attempts, max_oversearch_factor,
-         generate_machine_translations) = self._search_config
+         generate_machine_translations, _) = self._search_config
 
         # avoiding the usage of a dummy value might be conceptually cleaner but it'd mess up quite a lot,
         # particularly the datatype of the queues
@@ -584,25 +818,52 @@ class SentenceProducer:
         # counts sentences that are currently going through TL eval
         root_being_processed_amts = {root: 0 for root in words_by_root}
 
-        further_processing_queue = []
-        awaiting_batched_translation = []
-        awaiting_single_translation = []
-        passed_all_checks = []
+        # where the aspms are indexed we know up front how many sentences each has for each word - so we can skip
+        # words and aspms that have none, and tell how far along each word is
+        lemma_frequencies = self._get_lemma_frequencies(word_desired_amts)
+        root_candidate_amts = {root: None if any(frequencies is None for frequencies in lemma_frequencies.values())
+                               else sum(frequencies[word] for frequencies in lemma_frequencies.values())
+                               for root, word in words_by_root.items()}
+        # amt of candidates seen for each root
+        root_seen_amts = {root: 0 for root in words_by_root}
+        for root, candidate_amt in root_candidate_amts.items():
+            if candidate_amt == 0:
+                print(f"[Tatoebator] No sentences containing {words_by_root[root]} in any corpus, not searching it")
+                # (nothing is in flight yet, so it can just go)
+                roots_being_searched.remove(root)
+        if not roots_being_searched:
+            return {word: [] for word in found_sentences}
+
+        # the translation jobs run on the translator's thread - they only ever append to the deques (which is
+        # thread-safe) and everything else is only touched from this thread
+        further_processing_queue = deque()
+        awaiting_batched_translation = deque()
+        awaiting_single_translation = deque()
+        passed_all_checks = deque()
+        # roots of sentences that the tl jobs gave up on, so this thread can update root_being_processed_amts
+        abandoned_roots = deque()
         batch_translation_tasks = set()
         single_translation_tasks = set()
+        # set whenever a tl job finishes, so the final drain can wait on it instead of polling
+        tl_job_done = threading.Event()
+        # (ids of) sentences whose translation failed evaluation - retries skip the translation cache, it would
+        # just give back the same translation
+        retranslating = set()
 
         # to avoid duplicates within search
-        seen_sentences = []
+        # (root, sentence) pairs - a sentence may be used for several words, but only once for each
+        seen_sentences = set()
 
         # attempts_left, root, is_good, source_tag, c.e.sentence, callback score
         awaiting_translation_type = Tuple[int, str, bool, int, CandidateExampleSentence, float]
         # root, e.sentence, callback score
         passed_all_checks_type = Tuple[str, ExampleSentence, float]
 
-        def batch_translation_generate_job(batch: List[awaiting_translation_type]):
-            translation_batch = "\n".join([sentence.sentence for _, _, _, _, sentence, _ in batch])
-            machine_translations = self._translator.jp_to_eng(translation_batch).split("\n")
-            if len(machine_translations) != len(batch):
+        # the jobs run as coroutines on the translator's event loop
+        async def batch_translation_generate_job(batch: List[awaiting_translation_type]):
+            machine_translations = await self._translator.async_jp_to_eng_many(
+                [sentence.sentence for _, _, _, _, sentence, _ in batch])
+            if machine_translations is None:
                 awaiting_single_translation.extend(batch)
                 return
 
@@ -614,10 +875,11 @@ class SentenceProducer:
                     found_root, ExampleSentence.from_candidate(sentence, source_tag, is_good), score)
                 passed_all_checks.append(res)
 
-        def batch_translation_eval_job(batch: List[awaiting_translation_type]):
-            translation_batch = "\n".join([sentence.translation for _, _, _, _, sentence, _ in batch])
-            machine_translations = self._translator.eng_to_jp(translation_batch).split("\n")
-            if len(machine_translations) != len(batch):
+        async def batch_translation_eval_job(batch: List[awaiting_translation_type]):
+            machine_translations = await self._translator.async_eng_to_jp_many(
+                [sentence.translation for _, _, _, _, sentence, _ in batch],
+                use_cache=not any(id(sentence) in retranslating for _, _, _, _, sentence, _ in batch))
+            if machine_translations is None:
                 # if the batch translation went wrong (batch elements got mixed up), send everything to single tl
                 # don't increase n_attempts counter, this wasn't a real tl attempt bc it didn't go to evaluation
                 awaiting_single_translation.extend(batch)
@@ -626,41 +888,45 @@ class SentenceProducer:
             # if batch translation worked, evaluate everything normally
             # this mirrors the code in single tl eval, except failures are sent back to the batch translation queue
             # (instead of single tl queue)
+            evaluations = self._quality_control.evaluate_translation_quality_many(
+                [sentence for _, _, _, _, sentence, _ in batch], machine_translations)
             for (amt_tries, found_root, is_good,
-                 source_tag, sentence, score), machine_translation in zip(batch, machine_translations):
+                 source_tag, sentence, score), evaluation in zip(batch, evaluations):
 
-                evaluation = self._quality_control.evaluate_translation_quality(sentence, machine_translation)
                 if evaluation is not QualityEvaluationResult.UNSUITABLE:
                     res: passed_all_checks_type = (
                         found_root, ExampleSentence.from_candidate(sentence, source_tag, is_good), score)
                     passed_all_checks.append(res)
                 elif amt_tries + 1 < max_retranslation_attempts:
+                    retranslating.add(id(sentence))
                     awaiting_batched_translation.append((amt_tries + 1, found_root, is_good, source_tag, sentence, score))
                 else:
-                    root_being_processed_amts[found_root] -= 1
+                    abandoned_roots.append(found_root)
 
-        def single_translation_generate_job(item: awaiting_translation_type):
+        async def single_translation_generate_job(item: awaiting_translation_type):
             amt_tries, found_root, is_good, source_tag, sentence, score = item
-            machine_translation = self._translator.jp_to_eng(sentence.sentence)
+            machine_translation = await self._translator.async_jp_to_eng(sentence.sentence)
 
             sentence.translation = machine_translation
             res: passed_all_checks_type = (
                 found_root, ExampleSentence.from_candidate(sentence, source_tag, is_good), score)
             passed_all_checks.append(res)
 
-        def single_translation_eval_job(item: awaiting_translation_type):
+        async def single_translation_eval_job(item: awaiting_translation_type):
             amt_tries, found_root, is_good, source_tag, sentence, score = item
-            machine_translation = self._translator.eng_to_jp(sentence.translation)
+            machine_translation = await self._translator.async_eng_to_jp(sentence.translation,
+                                                                         use_cache=id(sentence) not in retranslating)
 
             evaluation = self._quality_control.evaluate_translation_quality(sentence, machine_translation)
             if evaluation is QualityEvaluationResult.UNSUITABLE:
                 # if no more tries, give up on this sentence
                 amt_tries += 1
                 if amt_tries >= max_retranslation_attempts:
-                    root_being_processed_amts[found_root] -= 1
+                    abandoned_roots.append(found_root)
                     return
                 # otherwise try again - create a new single tl task
-                item = (amt_tries, found_root, is_good, source_tag, sentence)
+                retranslating.add(id(sentence))
+                item = (amt_tries, found_root, is_good, source_tag, sentence, score)
                 awaiting_single_translation.append(item)
                 return
             # if tl check passes, this sentence is no longer being processed. send it to final queue
@@ -669,66 +935,71 @@ class SentenceProducer:
             passed_all_checks.append(res)
 
         def push_processing_queue_to_tl_queue():
-            t = 0  # we could just do the reverse index trick but then the queue would be lifo
-            for idx in range(len(further_processing_queue)):
-                idx -= t
-                root = further_processing_queue[idx][1]
+            # one pass through the queue, keeping the order of whatever stays in it
+            for _ in range(len(further_processing_queue)):
+                res = further_processing_queue.popleft()
+                root = res[1]
                 if root not in roots_being_searched:
-                    further_processing_queue.pop(idx)
-                    t += 1
                     continue
                 if max(translation_batch_size, root_remaining[root]) <= root_being_processed_amts[root]:
+                    further_processing_queue.append(res)
                     continue
-                res = further_processing_queue.pop(idx)
                 awaiting_batched_translation.append(res)
                 root_being_processed_amts[root] += 1
-                t += 1
+
+        def submit_tl_task(job: Callable[..., Coroutine], arg, task_set: Set[Future]):
+            future = self._translator.submit(job(arg))
+            task_set.add(future)
+
+            def on_done(future: Future):
+                task_set.discard(future)
+                tl_job_done.set()
+                # a thread would have printed this before dying
+                e = None if future.cancelled() else future.exception()
+                if e is not None:
+                    # (3-arg form - anki's python 3.9 doesn't have the 1-arg one)
+                    traceback.print_exception(type(e), e, e.__traceback__)
+
+            future.add_done_callback(on_done)
 
         def create_tl_tasks(translation_policy: TranslationPolicy, ignore_batch_size=False):
             while len(batch_translation_tasks) + len(single_translation_tasks) + 1 <= max_parallel_translations:
                 if len(awaiting_batched_translation) >= translation_batch_size \
                         or (ignore_batch_size and len(awaiting_batched_translation) > 0):
-                    batch = awaiting_batched_translation[:translation_batch_size]
-                    del awaiting_batched_translation[:translation_batch_size]
-
-                    task = AutoRemovingThread(target=(
-                        batch_translation_eval_job
-                        if translation_policy == TranslationPolicy.EVALUATE
-                        else batch_translation_generate_job),
-                        args=(batch,),
-                        thread_set=batch_translation_tasks)
+                    batch = [awaiting_batched_translation.popleft()
+                             for _ in range(min(translation_batch_size, len(awaiting_batched_translation)))]
 
-                    task.daemon = True
-                    task.start()
+                    submit_tl_task(batch_translation_eval_job
+                                   if translation_policy == TranslationPolicy.EVALUATE
+                                   else batch_translation_generate_job,
+                                   batch, batch_translation_tasks)
 
                 elif len(awaiting_single_translation) > 0:
-                    item = awaiting_single_translation.pop(0)
+                    item = awaiting_single_translation.popleft()
 
-                    task = AutoRemovingThread(target=(
-                        single_translation_eval_job
-                        if translation_policy == TranslationPolicy.EVALUATE
-                        else single_translation_generate_job),
-                        args=(item,),
-                        thread_set=single_translation_tasks)
-
-                    task.daemon = True
-                    task.start()
+                    submit_tl_task(single_translation_eval_job
+                                   if translation_policy == TranslationPolicy.EVALUATE
+                                   else single_translation_generate_job,
+                                   item, single_translation_tasks)
 
                 else:
                     break
 
         def gather_approved_sentences():
+            while abandoned_roots:
+                root_being_processed_amts[abandoned_roots.popleft()] -= 1
+
             while passed_all_checks:
-                found_root, example_sentence, score = passed_all_checks.pop(0)
+                found_root, example_sentence, score = passed_all_checks.popleft()
 
                 if found_root not in roots_being_searched:
                     continue
 
                 root_remaining[found_root] -= 1
                 root_being_processed_amts[found_root] -= 1
-                if example_sentence.sentence in seen_sentences:
+                if (found_root, example_sentence.sentence) in seen_sentences:
                     continue
-                seen_sentences.append(example_sentence.sentence)
+                seen_sentences.add((found_root, example_sentence.sentence))
 
                 found_word = words_by_root[found_root]
                 found_sentences[found_word].insert(score, example_sentence)
@@ -737,29 +1008,37 @@ class SentenceProducer:
                                                         and found_sentences[found_word].lowest_value() >= desired_score)):
                     roots_being_searched.remove(found_root)
 
-                    # clear further_processing queue and seen_sentences of this root
-                    for idx in range(len(further_processing_queue) - 1, -1):
-                        fpq_root = further_processing_queue[idx][1]
-                        if fpq_root == found_root:
-                            further_processing_queue.pop(idx)
-
-                    other_roots = roots_being_searched - {found_root}
-                    for idx in range(len(seen_sentences) - 1, -1):
-                        if found_root in seen_sentences[idx]:
-                            if not any((other_root in seen_sentences[idx] for other_root in other_roots)):
-                                seen_sentences.pop(idx)
+                    # clear further_processing queue of this root
+                    for _ in range(len(further_processing_queue)):
+                        res = further_processing_queue.popleft()
+                        if res[1] != found_root:
+                            further_processing_queue.append(res)
 
         search_idx = 0
+        amt_searched_before_aspm = 0
+        get_words_by_root = lambda: {root: words_by_root[root] for root in roots_being_searched}
+        # finds all the roots in a sentence in one pass. rebuilt when roots stop being searched
+        root_matcher = AhoCorasickMatcher(roots_being_searched)
         for aspm in self._aspms_for_searching:
 
             translation_policy = TranslationPolicy.DO_NOT_EVALUATE if aspm.translations_reliable else (
                 TranslationPolicy.GENERATE_OWN if generate_machine_translations else TranslationPolicy.DO_NOT_EVALUATE
             )
 
+            get_words_by_root_in_aspm = get_words_by_root
+            if lemma_frequencies[aspm] is not None:
+                get_words_by_root_in_aspm = lambda frequencies=lemma_frequencies[aspm]: {
+                    root: word for root, word in get_words_by_root().items() if frequencies[word] > 0}
+                if not get_words_by_root_in_aspm():
+                    # none of the words left are in here, no need to look
+                    amt_searched_before_aspm += aspm.amt_sentences
+                    continue
+
             source_tag = aspm.source_tag
-            for sentence in aspm.yield_sentences():
+            for amt_searched, sentence, pre_evaluation in self._yield_search_candidates(aspm,
+                                                                                        get_words_by_root_in_aspm):
                 search_idx += 1
-                search_ratio = search_idx / self.amt_searchable_sentences
+                search_ratio = (amt_searched_before_aspm + amt_searched) / self.amt_searchable_sentences
 
                 if search_idx % 10000 == 0 and progress_callback is not None:
                     progress_callback(aspm.source_name, search_ratio)
@@ -773,46 +1052,74 @@ class SentenceProducer:
                         return {word: sentences.get_items() for word, sentences in found_sentences.items()}
 
                 # skip sentence if it doesn't contain root of any word we're searching for
-                found_root = next((root for root in roots_being_searched if root in sentence.sentence), None)
-                if found_root is None: continue
+                if pre_evaluation is None:
+                    # (roots are only ever removed)
+                    if len(root_matcher.patterns) != len(roots_being_searched):
+                        root_matcher = AhoCorasickMatcher(roots_being_searched)
+                    found_roots = root_matcher.find_all(sentence.sentence)
+                else:
+                    found_roots = [root for root in pre_evaluation if root in roots_being_searched]
+                found_roots = [root for root in found_roots if (root, sentence.sentence) not in seen_sentences]
+                if not found_roots: continue
+                for found_root in found_roots:
+                    root_seen_amts[found_root] += 1
 
-                # evaluate quality, check contains word lexically
-                # +check filtering fun (most likely = check it's not in db)
-                if sentence.sentence in seen_sentences: continue
+                # check filtering fun (most likely = check it's not in db)
                 if filtering_callback is not None and not filtering_callback(sentence): continue
 
-                found_word = words_by_root[found_root]
-                evaluation = self._quality_control.evaluate_quality(sentence, word=found_word)
-                if evaluation is QualityEvaluationResult.UNSUITABLE: continue
-                is_good = evaluation is QualityEvaluationResult.GOOD
-
-                score = scoring_callback(sentence)
-                if score < min_score:
-                    continue
-
-                # if the proportion of sentences found for this word is lesser than the proportion of the
-                # searching db we've looked through, mark it as urgent:
-                # meaning it will attempt to be retranslated a few times if the quality check fails
-                found_ratio = found_sentences[found_word].amt_items() / root_desired_amts[found_root]
-                urgent = search_ratio > found_ratio
-                starting_index = 0 if urgent else max_retranslation_attempts - 1
+                # the sentence is considered for every word it contains
+                score = None
+                for found_root in found_roots:
+                    # evaluate quality, check contains word lexically
+                    found_word = words_by_root[found_root]
+                    if pre_evaluation is None:
+                        evaluation = self._quality_control.evaluate_quality(sentence, word=found_word)
+                    else:
+                        evaluation = pre_evaluation[found_root]
+                    if evaluation is QualityEvaluationResult.UNSUITABLE: continue
+                    is_good = evaluation is QualityEvaluationResult.GOOD
+
+                    # doesn't depend on the word, so only computed once
+                    if score is None:
+                        score = scoring_callback(sentence)
+                    if score < min_score:
+                        break
+
+                    # if the proportion of sentences found for this word is lesser than the proportion of the
+                    # searching db we've looked through, mark it as urgent:
+                    # meaning it will attempt to be retranslated a few times if the quality check fails
+                    # (the proportion of the word's own candidates, if we know how many there are)
+                    found_ratio = found_sentences[found_word].amt_items() / root_desired_amts[found_root]
+                    if root_candidate_amts[found_root] is None:
+                        urgent = search_ratio > found_ratio
+                    else:
+                        urgent = root_seen_amts[found_root] / max(1, root_candidate_amts[found_root]) > found_ratio
+                    starting_index = 0 if urgent else max_retranslation_attempts - 1
+
+                    if translation_policy == TranslationPolicy.DO_NOT_EVALUATE:
+                        res: passed_all_checks_type = (
+                            found_root, ExampleSentence.from_candidate(sentence, source_tag, is_good), score)
+                        root_being_processed_amts[found_root] += 1
+                        passed_all_checks.append(res)
+                    else:
+                        # tl tasks handle accounting for tl policy
+                        res: awaiting_translation_type = (starting_index, found_root, is_good, source_tag, sentence, score)
+                        further_processing_queue.append(res)
 
-                if translation_policy == TranslationPolicy.DO_NOT_EVALUATE:
-                    res: passed_all_checks_type = (
-                        found_root, ExampleSentence.from_candidate(sentence, source_tag, is_good), score)
-                    root_being_processed_amts[found_root] += 1
-                    passed_all_checks.append(res)
-                else:
-                    # tl tasks handle accounting for tl policy
-                    res: awaiting_translation_type = (starting_index, found_root, is_good, source_tag, sentence, score)
-                    further_processing_queue.append(res)
+            amt_searched_before_aspm += aspm.amt_sentences
 
         # if we still have some leftover stuff in the batch tl queue, make sure to push that through
-        while awaiting_single_translation or awaiting_batched_translation or single_translation_tasks or batch_translation_tasks:
-            time.sleep(0.1)
+        while True:
+            # cleared before looking at the queues, so a job finishing from here on wakes the wait below
+            tl_job_done.clear()
+            push_processing_queue_to_tl_queue()
             create_tl_tasks(translation_policy, ignore_batch_size=True)
             gather_approved_sentences()
             if len(roots_being_searched) == 0:
                 break
+            if not (awaiting_single_translation or awaiting_batched_translation
+                    or single_translation_tasks or batch_translation_tasks):
+                break
+            tl_job_done.wait()
 
         return {word: sentences.get_items() for word, sentences in found_sentences.items()}
@@ -0,0 +1,90 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Dict, List, Tuple, Iterator, Callable, Type
+
+from .candidate_example_sentences import ExampleSentenceQualityEvaluator, QualityEvaluationResult, \
+    CandidateExampleSentence
+from .line_offsets import open_mmap
+from ..language_processing.lexical_analysis import lexical_content_cache
+from ..util import AhoCorasickMatcher, running_as_anki_addon
+
+# c.e.sentence (w lexical words already computed), evaluation for each root found in it
+ShardCandidate = Tuple[CandidateExampleSentence, Dict[str, QualityEvaluationResult]]
+
+
+def sharded_search_available() -> bool:
+    # worker processes are started by running sys.executable - inside anki that's anki itself, not python
+    # so this is only for scripts (e.g. building/testing against corpora from the command line)
+    return not running_as_anki_addon() and os.path.basename(sys.executable).lower().startswith("python")
+
+
+def search_shard(aspm_class: Type, filepath: str, start: int, end: int,
+                 words_by_root: Dict[str, str]) -> List[ShardCandidate]:
+    """
+    runs in a worker process. goes through the lines starting within [start, end) of a SingleFileASPM's file and
+    returns the sentences that contain the root of one of the words and pass the quality checks that don't need
+    translating (incl. the lexical check, i.e. the expensive mecab call) for at least one of them
+    """
+    root_matcher = AhoCorasickMatcher(words_by_root)
+    candidates = []
+    with open_mmap(filepath) as mm:
+        # align to the first line starting at or after start
+        if start > 0:
+            mm.seek(start - 1)
+            mm.readline()
+        while mm.tell() < end:
+            line = mm.readline()
+            if not line: break
+            sentence = aspm_class.parse_line(aspm_class.decode_line(line))
+            evaluations = {}
+            for found_root in root_matcher.find_all(sentence.sentence):
+                evaluation = ExampleSentenceQualityEvaluator.evaluate_quality(sentence, word=words_by_root[found_root])
+                if evaluation is QualityEvaluationResult.UNSUITABLE: continue
+                evaluations[found_root] = evaluation
+            if evaluations:
+                candidates.append((sentence, evaluations))
+    # worker processes don't get to run atexit handlers
+    lexical_content_cache.flush()
+    return candidates
+
+
+def yield_sharded_candidates(aspm, get_words_by_root: Callable[[], Dict[str, str]],
+                             n_processes: int, shard_size: int) -> Iterator[Tuple[float, List[ShardCandidate]]]:
+    """
+    splits the aspm's file into byte-range shards and searches them in a process pool, yielding the candidates
+    from each shard as it finishes along with the (approximate) amt of the aspm's sentences searched so far.
+    shards are submitted lazily, a couple per process, so that stopping early (the caller just stops iterating)
+    doesn't leave the pool working through the whole corpus.
+    get_words_by_root is called on every submission so workers stop looking for words that are already done
+    not available inside anki, see sharded_search_available
+    """
+    if not sharded_search_available():
+        raise Exception(f"Attempted a sharded search, but worker processes can't be started from {sys.executable}")
+    filepath = aspm.get_source_filepaths()[0]
+    shards = aspm.get_byte_shards(shard_size)
+    if not shards:
+        return
+    sentences_per_byte = aspm.amt_sentences / shards[-1][1]
+
+    executor = ProcessPoolExecutor(max_workers=n_processes)
+    pending: List[Tuple[Future, int]] = []
+    next_shard = 0
+    amt_searched = 0
+    finished = False
+    try:
+        while next_shard < len(shards) or pending:
+            while next_shard < len(shards) and len(pending) < 2 * n_processes:
+                start, end = shards[next_shard]
+                future = executor.submit(search_shard, aspm.__class__, filepath, start, end, get_words_by_root())
+                pending.append((future, end - start))
+                next_shard += 1
+            # in order of submission - keeps the search roughly front to back, like the sequential version
+            future, shard_bytes = pending.pop(0)
+            candidates = future.result()
+            amt_searched += shard_bytes * sentences_per_byte
+            yield amt_searched, candidates
+        finished = True
+    finally:
+        # if the caller stopped early, don't wait for the shards that are still being searched
+        executor.shutdown(wait=finished, cancel_futures=True)
@@ -4,19 +4,26 @@ import threading
 import time
 from datetime import datetime, timedelta
 from queue import Empty, Queue
+from typing import Callable, List
 
 
 class TimedResourceManager:
     """
     Abstract base class for managing a resource that should be stopped
     after a period of inactivity.
+    Subclasses wrapping something that can only handle one request at a time (e.g. a pipe to a subprocess) should
+    set _serialize_requests
     """
 
+    _serialize_requests = False
+
     def __init__(self, timeout: int = 60):
         self.timeout = timeout
         self.last_request_time = None
         self.is_resource_running = False
         self._lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self._requests_in_flight = 0
         self._monitor_thread = None
 
     def _start_monitor_thread(self):
@@ -30,7 +37,8 @@ class TimedResourceManager:
                             datetime.now() - self.last_request_time
                     )
 
-                    if time_until_timeout <= timedelta():
+                    # never stop the resource from under a request
+                    if time_until_timeout <= timedelta() and self._requests_in_flight == 0:
                         self._stop_resource_managed()
                         return
 
@@ -52,7 +60,20 @@ class TimedResourceManager:
             else:
                 # Update the last request time to extend the timeout
                 self.last_request_time = datetime.now()
-        return self._process_request(*args, **kwargs)
+            self._requests_in_flight += 1
+        try:
+            if self._serialize_requests:
+                with self._request_lock:
+                    return self._process_request(*args, **kwargs)
+            return self._process_request(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._requests_in_flight -= 1
+                self.last_request_time = datetime.now()
+
+    @property
+    def is_busy(self) -> bool:
+        return self._requests_in_flight > 0
 
     def shutdown(self):
         with self._lock:
@@ -83,6 +104,39 @@ class TimedResourceManager:
         raise NotImplementedError()
 
 
+class TimedResourcePool:
+    """
+    A fixed amount of TimedResourceManagers of the same kind, used as one.
+    Requests go to an idle resource if there is one (otherwise round robin), so that concurrent callers don't queue
+    behind each other. Each resource still starts on its first request and stops after its own period of inactivity.
+    """
+
+    def __init__(self, resource_factory: Callable[[], TimedResourceManager], size: int):
+        if size < 1:
+            raise ValueError(f"TimedResourcePool size must be at least 1, got {size}")
+        self._resources: List[TimedResourceManager] = [resource_factory() for _ in range(size)]
+        self._lock = threading.Lock()
+        self._next_idx = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._resources)
+
+    def _pick_resource(self) -> TimedResourceManager:
+        with self._lock:
+            idxs = [(self._next_idx + offset) % self.size for offset in range(self.size)]
+            idx = next((idx for idx in idxs if not self._resources[idx].is_busy), idxs[0])
+            self._next_idx = (idx + 1) % self.size
+            return self._resources[idx]
+
+    def process_request_managed(self, *args, **kwargs):
+        return self._pick_resource().process_request_managed(*args, **kwargs)
+
+    def shutdown(self):
+        for resource in self._resources:
+            resource.shutdown()
+
+
 class BackgroundProcessor:
     def __init__(self, task_file: str):
         self._task_file = task_file
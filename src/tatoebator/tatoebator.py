@@ -50,7 +50,13 @@ class Tatoebator:
         self.registry_editor.show()
 
     def _update_known_counts(self):
-        self.sentence_repository.update_known(self.anki_db_interface.get_known_words())
+        changes = self.anki_db_interface.get_known_word_changes(self.sentence_repository.db_generation)
+        if changes is None:
+            self.sentence_repository.update_known(self.anki_db_interface.get_known_words())
+        else:
+            self.sentence_repository.apply_known_changes(*changes)
+        # only once the db is up to date - if we crash before this the same changes just get applied again
+        self.anki_db_interface.save_known_word_tracking()
 
     def _init_anki_inteface(self):
         self.anki_db_interface = AnkiDbInterface(self.media_manager)
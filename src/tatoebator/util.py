@@ -3,7 +3,9 @@ import sys
 import bisect
 from hashlib import sha256
 import threading
-from typing import Callable, Any, Tuple, Dict, Set, List
+from collections import deque
+from itertools import islice
+from typing import Callable, Any, Tuple, Dict, Set, List, Iterable, FrozenSet, Iterator
 
 
 def deterministic_hash(string: str) -> str:
@@ -12,6 +14,13 @@ def deterministic_hash(string: str) -> str:
     return m.hexdigest()
 
 
+def batched(iterable: Iterable, n: int) -> Iterator[List]:
+    # itertools.batched is 3.12+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, n)):
+        yield batch
+
+
 def running_as_anki_addon() -> bool:
     _, exec_name = os.path.split(sys.executable)
     return exec_name == "anki.exe"
@@ -141,6 +150,63 @@ class RankedBuffer:
         return self._items[0].value if self._items else default_value
 
 
+class AhoCorasickMatcher:
+    """
+    finds which of a set of patterns appear in a text in one pass over the text, instead of doing
+    'pattern in text' once per pattern. overlapping matches are all found
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = frozenset(patterns)
+        self._matches_empty = "" in self.patterns
+        self._alphabet = set()
+
+        # trie, w a failure link and a set of matched patterns for every node. node 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+
+        for pattern in self.patterns:
+            if not pattern: continue
+            self._alphabet.update(pattern)
+            node = 0
+            for char in pattern:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(frozenset())
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node] = self._output[node] | {pattern}
+
+        # bfs to set up failure links, merging in the output of the node each one points to
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] | self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> Set[str]:
+        goto, fail, output, alphabet = self._goto, self._fail, self._output, self._alphabet
+        found = {""} if self._matches_empty else set()
+        node = 0
+        for char in text:
+            if char not in alphabet:
+                node = 0
+                continue
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
 def subclass_must_define_attributes(attrs):
     def decorator(cls):
         @classmethod
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from tatoebator.constants import PATH_TO_OTHER_DATA
+from tatoebator.language_processing.kanji_neighbours import KanjiNeighbourTable
+
+# how long does it take to get to the first sentence distance, and how much memory does it take,
+# parsing dembeddings.json the way it used to be done vs mmapping the precompiled binary
+# the binary is built in a temp dir, so that the one next to the real json is left alone
+
+path = os.path.join(PATH_TO_OTHER_DATA, "dembeddings.json")
+temp_dir = tempfile.TemporaryDirectory()
+sentence_kanji = "私は昨日新しい本を読みました今日雨降"
+
+
+def make_table():
+    table = KanjiNeighbourTable(path)
+    table.filepath = os.path.join(temp_dir.name, os.path.basename(table.filepath))
+    return table
+
+
+def load_json():
+    with open(path, "r") as f:
+        distances = json.load(f)["nearest"]
+    related_pairs = {kanji: list(close_kanji.keys()) for kanji, close_kanji in distances.items()}
+    return related_pairs, [related_pairs.get(kanji) for kanji in sentence_kanji]
+
+
+def load_binary():
+    table = make_table().open()
+    return table, [table.get(kanji) for kanji in sentence_kanji]
+
+
+def measure(name, fun):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    res = fun()
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} {elapsed * 1000:8.2f} ms    peak {peak / 2 ** 20:7.2f} MB    kept {current / 2 ** 20:7.2f} MB")
+    return res
+
+
+table = make_table()
+t0 = time.perf_counter()
+table.build()
+print(f"build    {(time.perf_counter() - t0) * 1000:8.2f} ms    "
+      f"({os.path.getsize(path) / 2 ** 20:.2f} MB json -> {os.path.getsize(table.filepath) / 2 ** 20:.2f} MB binary)")
+
+_, json_res = measure("json", load_json)
+binary_table, binary_res = measure("binary", load_binary)
+assert [None if neighbours is None else frozenset(neighbours).union(kanji)
+        for kanji, neighbours in zip(sentence_kanji, json_res)] == binary_res
+binary_table.close()
+temp_dir.cleanup()